@@ -0,0 +1,206 @@
+"""
+Times Screenshot.capture_page in each capture mode against local fixture pages, reporting the wall time, the number
+of WebDriver round trips and the peak resident memory of this process for every mode and page height. Save the
+results with --output and compare them between releases to catch regressions. Run from the root of the repo:
+    PYTHONPATH=. python benchmarks/bench_capture.py --heights 2000 8000 --output capture.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import threading
+import time
+
+from capture_fixture import PageServer, HEADER_ID, FOOTER_ID
+from the_ark.screen_capture import Screenshot
+from the_ark.selenium_helpers import SeleniumHelpers
+
+RSS_SAMPLE_INTERVAL = 0.005
+PROC_STATUS = "/proc/self/status"
+
+
+def capture_viewport(sh):
+    return Screenshot(sh).capture_page(viewport_only=True)
+
+
+def capture_paginated(sh):
+    return Screenshot(sh, paginated=True).capture_page()
+
+
+def capture_full_page(sh):
+    return Screenshot(sh).capture_page()
+
+
+def capture_sticky_full_page(sh):
+    return Screenshot(sh, header_ids=["#" + HEADER_ID], footer_ids=["#" + FOOTER_ID]).capture_page()
+
+
+def capture_headless(sh):
+    screenshot = Screenshot(sh)
+    screenshot.headless = True
+    return screenshot.capture_page()
+
+
+def capture_headless_paginated(sh):
+    screenshot = Screenshot(sh, paginated=True)
+    screenshot.headless = True
+    return screenshot.capture_page()
+
+
+def capture_pipelined_paginated(sh):
+    with Screenshot(sh, paginated=True) as screenshot:
+        return [result.get() for result in screenshot.capture_page_pipelined()]
+
+
+# Each mode is the capture function and whether its page has sticky elements
+MODES = [
+    ("viewport", capture_viewport, False),
+    ("paginated", capture_paginated, False),
+    ("full_page", capture_full_page, False),
+    ("full_page_sticky", capture_sticky_full_page, True),
+    ("headless", capture_headless, False),
+    ("headless_paginated", capture_headless_paginated, False),
+    ("pipelined_paginated", capture_pipelined_paginated, False),
+]
+
+
+class RoundTripCounter(object):
+    """
+    Counts the commands a driver sends to the browser. Every WebDriver command, including those sent through
+    WebElements, goes through the driver's execute() method.
+    """
+    def __init__(self, driver):
+        self.count = 0
+        self._execute = driver.execute
+        driver.execute = self.execute
+
+    def execute(self, *args, **kwargs):
+        self.count += 1
+        return self._execute(*args, **kwargs)
+
+
+class PeakRSSSampler(object):
+    """
+    Samples the resident memory of this process from a background thread. Where /proc is not available the peak for
+    the whole process so far is reported instead.
+    """
+    def __init__(self):
+        self.peak = 0
+        self._running = False
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = current_rss()
+        if os.path.exists(PROC_STATUS):
+            self._running = True
+            self._thread = threading.Thread(target=self._sample)
+            self._thread.daemon = True
+            self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._running = False
+        if self._thread:
+            self._thread.join()
+        else:
+            self.peak = max(self.peak, max_rss())
+
+    def _sample(self):
+        while self._running:
+            self.peak = max(self.peak, current_rss())
+            time.sleep(RSS_SAMPLE_INTERVAL)
+
+
+def current_rss():
+    """
+    The resident memory of this process in bytes
+    """
+    if not os.path.exists(PROC_STATUS):
+        return max_rss()
+
+    with open(PROC_STATUS) as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def max_rss():
+    """
+    The peak resident memory of this process in bytes
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def run_mode(sh, counter, capture, url, repeat):
+    """
+    Loads the page once, then captures it the given number of times.
+    :return
+        - result:   dict - The best and median wall time, the round trips of one capture and the peak memory
+    """
+    sh.load_url(url, bypass_status_code_check=True)
+    times = []
+    round_trips = []
+    with PeakRSSSampler() as sampler:
+        for _ in range(repeat):
+            sh.scroll_window_to_position(0)
+            counter.count = 0
+            start = time.time()
+            capture(sh)
+            times.append(time.time() - start)
+            round_trips.append(counter.count)
+
+    times.sort()
+    return {"best_ms": times[0] * 1000, "median_ms": times[len(times) // 2] * 1000,
+            "round_trips": round_trips[-1], "peak_rss_mb": sampler.peak / 1024.0 / 1024.0}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--browser", default="phantomjs", help="The browserName given to create_driver")
+    parser.add_argument("--binary", help="The path to the browser binary")
+    parser.add_argument("--heights", type=int, nargs="+", default=[2000, 8000], help="Page heights in CSS pixels")
+    parser.add_argument("--modes", nargs="+", choices=[name for name, _, _ in MODES],
+                        default=[name for name, _, _ in MODES])
+    parser.add_argument("--window", default="1280x800", help="The browser window size, WIDTHxHEIGHT")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="A file to save the results to as JSON")
+    args = parser.parse_args()
+
+    capabilities = {"browserName": args.browser}
+    if args.binary:
+        capabilities["binary"] = args.binary
+
+    sh = SeleniumHelpers()
+    sh.create_driver(**capabilities)
+    width, height = [int(size) for size in args.window.split("x")]
+    results = []
+
+    try:
+        counter = RoundTripCounter(sh.driver)
+        with PageServer() as server:
+            print("{0:<22} {1:>8} {2:>10} {3:>10} {4:>12} {5:>10}".format(
+                "mode", "height", "best ms", "median ms", "round trips", "peak MB"))
+            for name, capture, sticky in MODES:
+                if name not in args.modes:
+                    continue
+                for page_height in args.heights:
+                    sh.resize_browser(width, height)
+                    result = run_mode(sh, counter, capture, server.url(page_height, sticky), args.repeat)
+                    result.update({"mode": name, "height": page_height, "browser": args.browser})
+                    results.append(result)
+                    print("{mode:<22} {height:>8} {best_ms:>10.1f} {median_ms:>10.1f} {round_trips:>12} "
+                          "{peak_rss_mb:>10.1f}".format(**result))
+    finally:
+        sh.quit_driver()
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Compares the row hashing overlap search used by Screenshot._crop_and_stitch_image against the original row by row
+loop. Run from the root of the repo:
+    PYTHONPATH=. python benchmarks/bench_crop_and_stitch.py
+"""
+import argparse
+import numpy
+import timeit
+
+from the_ark.screen_capture import find_overlap_row
+
+
+def legacy_overlap_row(header_array, footer_array, pixel_match_offset):
+    """
+    The original loop from Screenshot._crop_and_stitch_image, kept here as the reference implementation
+    """
+    crop_row = 0
+    header_image_height = len(header_array)
+    header_last_hundred_rows = header_array[header_image_height - pixel_match_offset: header_image_height]
+
+    for i, footer_row in enumerate(footer_array):
+        if crop_row != 0:
+            break
+
+        if numpy.array_equal(footer_row, header_last_hundred_rows[0]):
+            for y, row in enumerate(header_last_hundred_rows):
+                if numpy.array_equal(footer_array[i + y], header_last_hundred_rows[y]):
+                    if y == pixel_match_offset - 1:
+                        crop_row = i + pixel_match_offset
+                        break
+
+    return crop_row
+
+
+def build_captures(width, viewport_height, page_height, text_offset, seed=0):
+    """
+    Builds a header and footer capture of a synthetic page that is white with lines of "text" on it. The text offset
+    moves the lines so that the header rows being searched for start either on text or on blank background.
+    """
+    random_state = numpy.random.RandomState(seed)
+    page = numpy.full((page_height, width, 4), 255, dtype=numpy.uint8)
+    for top in range(text_offset, page_height - 40, 60):
+        left = random_state.randint(0, width // 4)
+        right = random_state.randint(width // 2, width)
+        page[top:top + 24, left:right, :3] = random_state.randint(0, 96, (24, right - left, 3))
+
+    header = page[:viewport_height]
+    footer = page[page_height - viewport_height:]
+    return header, footer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--width", type=int, default=2880, help="Capture width in pixels (1440 at scale factor 2)")
+    parser.add_argument("--viewport-height", type=int, default=1800, help="Height of each capture in pixels")
+    parser.add_argument("--overlap", type=int, default=600, help="Rows shared by the header and footer captures")
+    parser.add_argument("--pixel-match-offset", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    page_height = 2 * args.viewport_height - args.overlap
+    header_match_row = args.viewport_height - args.pixel_match_offset
+    print("captures: {0}x{1} | overlap: {2} rows".format(args.width, args.viewport_height, args.overlap))
+
+    # Line the text up so the searched rows start on a text line, then on the blank background
+    for name, text_offset in (("text row", header_match_row % 60), ("blank row", (header_match_row + 30) % 60)):
+        header, footer = build_captures(args.width, args.viewport_height, page_height, text_offset)
+
+        legacy_row = legacy_overlap_row(header, footer, args.pixel_match_offset)
+        hashed_row = find_overlap_row(header, footer, args.pixel_match_offset)
+        if legacy_row != hashed_row:
+            raise SystemExit("Crop rows differ | legacy: {0} hashed: {1}".format(legacy_row, hashed_row))
+
+        legacy_time = min(timeit.repeat(lambda: legacy_overlap_row(header, footer, args.pixel_match_offset),
+                                        number=1, repeat=args.repeat))
+        hashed_time = min(timeit.repeat(lambda: find_overlap_row(header, footer, args.pixel_match_offset),
+                                        number=1, repeat=args.repeat))
+
+        print("match starts on a {0} | crop row: {1}".format(name, hashed_row))
+        print("    legacy loop: {0:8.2f} ms".format(legacy_time * 1000))
+        print("    row hashing: {0:8.2f} ms".format(hashed_time * 1000))
+        print("    speedup:     {0:8.1f}x".format(legacy_time / hashed_time))
+
+
+if __name__ == "__main__":
+    main()
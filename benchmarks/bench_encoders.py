@@ -0,0 +1,57 @@
+"""
+Reports the encode time and file size of each Screenshot encoder preset on real captures. Pass the paths of PNG
+captures saved from a browser, the repo's test image is used when none are given. Run from the root of the repo:
+    PYTHONPATH=. python benchmarks/bench_encoders.py captures/*.png
+"""
+import argparse
+import os
+import timeit
+
+from PIL import Image
+from StringIO import StringIO
+from the_ark import image_encoders
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CAPTURE = os.path.normpath(os.path.join(ROOT, "..", "tests", "etc", "test.png"))
+
+ENCODERS = [
+    ("png (default)", image_encoders.get_encoder(image_encoders.PNG_PRESET)),
+    ("png compress_level=1", image_encoders.png_encoder(compress_level=1)),
+    ("png compress_level=9", image_encoders.png_encoder(compress_level=9)),
+    ("png_fast", image_encoders.png_fast_encoder()),
+    ("webp_lossless method=0", image_encoders.webp_lossless_encoder(method=0)),
+    ("webp_lossless method=4", image_encoders.webp_lossless_encoder()),
+    ("jpeg quality=85", image_encoders.jpeg_encoder()),
+    ("jpeg quality=70", image_encoders.jpeg_encoder(quality=70)),
+]
+
+
+def encode(encoder, image):
+    image_file = StringIO()
+    encoder.encode(image, image_file)
+    return image_file
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("captures", nargs="*", default=[DEFAULT_CAPTURE], help="Paths to PNG captures")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for capture in args.captures:
+        image = Image.open(capture)
+        image.load()
+        browser_size = os.path.getsize(capture)
+        print("{0} | {1}x{2} {3} | browser PNG: {4} bytes".format(capture, image.size[0], image.size[1],
+                                                                  image.mode, browser_size))
+        print("    {0:<24} {1:>10} {2:>12} {3:>8}".format("encoder", "ms", "bytes", "ratio"))
+
+        for name, encoder in ENCODERS:
+            encode_time = min(timeit.repeat(lambda: encode(encoder, image), number=1, repeat=args.repeat))
+            size = len(encode(encoder, image).getvalue())
+            print("    {0:<24} {1:>10.1f} {2:>12} {3:>8.2f}".format(
+                name, encode_time * 1000, size, float(size) / browser_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+A local HTTP server for capture benchmarks. It serves synthetic pages of any height, built from colored, labeled
+blocks so that no two rows of a capture are alike, with optional sticky headers and footers:
+    http://127.0.0.1:<port>/page?height=8000&sticky=1
+Run it on its own to look at the pages in a browser:
+    PYTHONPATH=. python benchmarks/capture_fixture.py --port 8000
+"""
+import argparse
+import threading
+import urlparse
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+DEFAULT_PAGE_HEIGHT = 4000
+BLOCK_HEIGHT = 100
+STICKY_HEIGHT = 60
+HEADER_ID = "header"
+FOOTER_ID = "footer"
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Capture fixture {height}px</title>
+<style>
+    html, body {{ margin: 0; padding: 0; font-family: sans-serif; }}
+    .block {{ height: {block_height}px; line-height: {block_height}px; padding-left: 20px; font-size: 32px; }}
+    .sticky {{ position: fixed; left: 0; right: 0; height: {sticky_height}px; background: #222; color: #fff; }}
+    #{header_id} {{ top: 0; }}
+    #{footer_id} {{ bottom: 0; }}
+</style>
+</head>
+<body>
+{sticky}
+{blocks}
+</body>
+</html>
+"""
+
+STICKY_TEMPLATE = """<div id="{header_id}" class="sticky">Sticky header</div>
+<div id="{footer_id}" class="sticky">Sticky footer</div>"""
+
+
+def build_page(height=DEFAULT_PAGE_HEIGHT, sticky=False):
+    """
+    Builds the HTML of a page that is the given height.
+    :param
+        - height:   int - The height of the page content in CSS pixels
+        - sticky:   bool - Whether the page has a header stuck to the top and a footer stuck to the bottom
+    :return
+        - html:     string - The page
+    """
+    blocks = []
+    for i in range(max(1, height // BLOCK_HEIGHT)):
+        # Step through the colors unevenly so neighboring blocks never share a background
+        color = "#{0:02x}{1:02x}{2:02x}".format((i * 67) % 256, (i * 131) % 256, (i * 29 + 128) % 256)
+        blocks.append('<div class="block" style="background: {0};">Block {1}</div>'.format(color, i))
+
+    sticky_html = STICKY_TEMPLATE.format(header_id=HEADER_ID, footer_id=FOOTER_ID) if sticky else ""
+    return PAGE_TEMPLATE.format(height=height, block_height=BLOCK_HEIGHT, sticky_height=STICKY_HEIGHT,
+                                header_id=HEADER_ID, footer_id=FOOTER_ID, sticky=sticky_html,
+                                blocks="\n".join(blocks))
+
+
+class PageRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse.urlparse(self.path)
+        if url.path != "/page":
+            self.send_error(404)
+            return
+
+        query = urlparse.parse_qs(url.query)
+        try:
+            height = int(query.get("height", [DEFAULT_PAGE_HEIGHT])[0])
+        except ValueError:
+            self.send_error(400, "height must be a number")
+            return
+        sticky = query.get("sticky", ["0"])[0] not in ("0", "false", "")
+
+        body = build_page(height, sticky)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Keep request logs out of the benchmark output
+        pass
+
+
+class PageServer(object):
+    """
+    Serves the fixture pages from a background thread.
+    """
+    def __init__(self, host="127.0.0.1", port=0):
+        """
+        :param
+            - host:     string - The address to listen on
+            - port:     int - The port to listen on. 0 picks a free port
+        """
+        self.server = HTTPServer((host, port), PageRequestHandler)
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def url(self, height=DEFAULT_PAGE_HEIGHT, sticky=False):
+        host, port = self.server.server_address
+        return "http://{0}:{1}/page?height={2}&sticky={3}".format(host, port, height, int(sticky))
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    server = PageServer(port=args.port)
+    print("Serving {0}".format(server.url(sticky=True)))
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
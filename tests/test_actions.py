@@ -426,6 +426,30 @@ class ActionTestCase(unittest.TestCase):
         self.ac.wait_for_element(action)
         self.ac.sh.wait_for_element.assert_called_with(action[CSS_SELECTOR_KEY], action[DURATION_KEY])
 
+    # - Wait for Network Idle Action
+    def test_wait_for_network_idle_defaults(self):
+        action = {
+            ACTION_KEY: WAIT_FOR_NETWORK_IDLE_ACTION
+        }
+        self.ac.wait_for_network_idle(action)
+        self.ac.sh.wait_for_network_idle.assert_called_with(500, 15)
+
+    def test_wait_for_network_idle_with_duration(self):
+        action = {
+            ACTION_KEY: WAIT_FOR_NETWORK_IDLE_ACTION,
+            IDLE_MS_KEY: 250,
+            DURATION_KEY: 10
+        }
+        self.ac.wait_for_network_idle(action)
+        self.ac.sh.wait_for_network_idle.assert_called_with(action[IDLE_MS_KEY], action[DURATION_KEY])
+
+    def test_wait_for_network_idle_timeout(self):
+        action = {
+            ACTION_KEY: WAIT_FOR_NETWORK_IDLE_ACTION
+        }
+        self.ac.sh.wait_for_network_idle.return_value = False
+        self.assertRaises(ActionException, self.ac.wait_for_network_idle, action)
+
     # - Special Key Action
     def test_send_special_key(self):
         action = {
@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import Mock
+from selenium.webdriver.remote.webdriver import WebDriver
+from the_ark import command_instrumentation, selenium_helpers
+
+
+class CommandInstrumentationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        # A driver without a browser behind it, whose commands are answered by a mock
+        self.driver = WebDriver.__new__(WebDriver)
+        self.driver.w3c = False
+        self.driver.execute = self.execute = Mock(return_value={"status": 0, "value": "title"})
+        self.sh = selenium_helpers.SeleniumHelpers()
+        self.sh.driver = self.driver
+        self.instrumentation = command_instrumentation.CommandInstrumentation(bucket_bounds=(10, 100))
+        self.instrumentation.instrument(self.driver)
+
+    def test_instrument_records_commands(self):
+        self.assertEqual(self.driver.execute("getTitle"), {"status": 0, "value": "title"})
+        self.execute.assert_called_once_with("getTitle", None)
+        stats = self.instrumentation.summary()[0]
+        self.assertEqual((stats["command"], stats["helper"], stats["count"]),
+                         ("getTitle", command_instrumentation.DIRECT_HELPER, 1))
+        self.assertEqual(stats["response_bytes"], len("title"))
+
+    def test_commands_are_charged_to_helper(self):
+        self.sh.get_current_url()
+        self.sh.execute_script("return 1;")
+        summary = dict((stats["command"], stats) for stats in self.instrumentation.summary())
+        self.assertEqual(summary["getCurrentUrl"]["helper"], "SeleniumHelpers.get_current_url")
+        self.assertEqual(summary["executeScript"]["helper"], "SeleniumHelpers.execute_script")
+        self.assertEqual(summary["executeScript"]["request_bytes"],
+                         len(json.dumps({"script": "return 1;", "args": []})))
+
+    def test_failed_command_is_recorded(self):
+        self.execute.side_effect = Exception("Boo!")
+        self.assertRaises(Exception, self.driver.execute, "getTitle")
+        stats = self.instrumentation.summary()[0]
+        self.assertEqual((stats["count"], stats["errors"], stats["response_bytes"]), (1, 1, 0))
+
+    def test_record_histogram(self):
+        for latency_ms in (5, 50, 50, 500):
+            self.instrumentation.record("getTitle", "Screenshot.capture_page", latency_ms)
+        stats = self.instrumentation.summary()[0]
+        self.assertEqual(stats["histogram"], [["<=10ms", 1], ["<=100ms", 2], [">100ms", 1]])
+        self.assertEqual((stats["total_ms"], stats["mean_ms"], stats["max_ms"]), (605, 151.25, 500))
+
+    def test_summary_is_sorted_by_total_time(self):
+        self.instrumentation.record("getTitle", "SeleniumHelpers.load_url", 5)
+        self.instrumentation.record("getTitle", "Screenshot.capture_page", 50)
+        self.instrumentation.record("executeScript", "SeleniumHelpers.load_url", 20)
+        self.assertEqual([(stats["helper"], stats["command"]) for stats in self.instrumentation.summary()],
+                         [("Screenshot.capture_page", "getTitle"), ("SeleniumHelpers.load_url", "executeScript"),
+                          ("SeleniumHelpers.load_url", "getTitle")])
+        self.assertEqual([(total["helper"], total["count"]) for total in self.instrumentation.helper_totals()],
+                         [("Screenshot.capture_page", 1), ("SeleniumHelpers.load_url", 2)])
+
+    def test_instrument_twice(self):
+        self.instrumentation.instrument(self.driver)
+        self.driver.execute("getTitle")
+        self.assertEqual(self.instrumentation.summary()[0]["count"], 1)
+
+    def test_uninstrument(self):
+        self.instrumentation.uninstrument(self.driver)
+        self.assertIs(self.driver.execute, self.execute)
+        self.driver.execute("getTitle")
+        self.assertEqual(self.instrumentation.summary(), [])
+
+    def test_reset(self):
+        self.driver.execute("getTitle")
+        self.instrumentation.reset()
+        self.assertEqual(self.instrumentation.summary(), [])
+
+    def test_report(self):
+        self.sh.get_current_url()
+        self.sh.execute_script("return 1;")
+        report = self.instrumentation.report()
+        self.assertEqual(len(report.splitlines()), 3)
+        self.assertIn("SeleniumHelpers.get_current_url", report)
+
+    def test_dump(self):
+        self.sh.get_current_url()
+        self.sh.execute_script("return 1;")
+        directory = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(directory, "commands.json")
+            self.instrumentation.dump(file_path)
+            with open(file_path) as dump_file:
+                dump = json.load(dump_file)
+            self.assertEqual(dump["bucket_bounds_ms"], [10, 100])
+            self.assertEqual(len(dump["helpers"]), 2)
+            self.assertEqual(len(dump["commands"]), 2)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_dump_invalid(self):
+        self.assertRaises(command_instrumentation.CommandInstrumentationError, self.instrumentation.dump,
+                          "/nonexistent/commands.json")
+
+    def test_payload_size(self):
+        self.assertEqual(command_instrumentation.payload_size(None), 0)
+        self.assertEqual(command_instrumentation.payload_size("abc"), 3)
+        self.assertEqual(command_instrumentation.payload_size({"a": 1}), len('{"a": 1}'))
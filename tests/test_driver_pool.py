@@ -0,0 +1,115 @@
+import unittest
+
+from mock import patch, Mock, PropertyMock
+from the_ark import driver_pool, selenium_helpers
+
+
+class DriverPoolTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.drivers = []
+        self.pool = driver_pool.DriverPool(size=2, max_age=60, driver_factory=self.create_driver)
+
+    def create_driver(self, **desired_capabilities):
+        driver = Mock()
+        driver.window_handles = ["first"]
+        window_size = {"width": 1024, "height": 768}
+        driver.get_window_size.side_effect = lambda: dict(window_size)
+        driver.set_window_size.side_effect = lambda width, height: window_size.update(width=width, height=height)
+        self.drivers.append(driver)
+        return driver
+
+    def test_lease_creates_driver(self):
+        driver = self.pool.lease(browserName="chrome")
+        self.assertIs(driver, self.drivers[0])
+        self.assertTrue(self.pool.is_leased(driver))
+
+    def test_released_driver_is_leased_again(self):
+        driver = self.pool.lease(browserName="chrome", headless=True)
+        self.pool.release(driver)
+        self.assertEqual(self.pool.idle_count(browserName="chrome", headless=True), 1)
+        self.assertIs(self.pool.lease(headless=True, browserName="chrome"), driver)
+        self.assertEqual(len(self.drivers), 1)
+
+    def test_capabilities_are_pooled_separately(self):
+        self.pool.release(self.pool.lease(browserName="chrome"))
+        self.assertIsNot(self.pool.lease(browserName="firefox"), self.drivers[0])
+        self.assertEqual(self.pool.idle_count(browserName="chrome"), 1)
+
+    def test_release_resets_driver(self):
+        driver = self.pool.lease(browserName="chrome")
+        driver.window_handles = ["first", "popup"]
+        self.pool.release(driver)
+        driver.switch_to.window.assert_called_with("first")
+        self.assertEqual(driver.close.call_count, 1)
+        self.assertTrue(driver.delete_all_cookies.called)
+        driver.execute_script.assert_called_once_with(driver_pool.CLEAR_STORAGE_SCRIPT)
+        driver.get.assert_called_once_with(driver_pool.BLANK_PAGE)
+
+    def test_release_restores_window_size(self):
+        driver = self.pool.lease(browserName="chrome")
+        driver.set_window_size(320, 480)
+        self.pool.release(driver)
+        self.assertIs(self.pool.lease(browserName="chrome"), driver)
+        self.assertEqual(driver.get_window_size(), {"width": 1024, "height": 768})
+
+    def test_failed_reset_evicts_driver(self):
+        driver = self.pool.lease(browserName="chrome")
+        driver.get.side_effect = Exception("Boo!")
+        self.pool.release(driver)
+        self.assertTrue(driver.quit.called)
+        self.assertEqual(self.pool.idle_count(), 0)
+
+    def test_full_pool_evicts_driver(self):
+        drivers = [self.pool.lease(browserName="chrome") for _ in range(3)]
+        for driver in drivers:
+            self.pool.release(driver)
+        self.assertEqual(self.pool.idle_count(browserName="chrome"), 2)
+        self.assertTrue(drivers[2].quit.called)
+
+    def test_unhealthy_driver_is_evicted(self):
+        driver = self.pool.lease(browserName="chrome")
+        self.pool.release(driver)
+        type(driver).current_url = PropertyMock(side_effect=Exception("Boo!"))
+        self.assertIsNot(self.pool.lease(browserName="chrome"), driver)
+        self.assertTrue(driver.quit.called)
+
+    @patch("time.time")
+    def test_old_driver_is_evicted(self, mock_time):
+        mock_time.return_value = 1000
+        driver = self.pool.lease(browserName="chrome")
+        self.pool.release(driver)
+        mock_time.return_value = 1061
+        self.assertIsNot(self.pool.lease(browserName="chrome"), driver)
+        self.assertTrue(driver.quit.called)
+
+    def test_warm_up(self):
+        self.pool.warm_up(browserName="chrome")
+        self.assertEqual(len(self.drivers), 2)
+        self.assertIn(self.pool.lease(browserName="chrome"), self.drivers)
+        self.assertEqual(len(self.drivers), 2)
+
+    def test_release_unknown_driver(self):
+        self.assertRaises(driver_pool.DriverPoolError, self.pool.release, Mock())
+
+    def test_close(self):
+        self.pool.warm_up(browserName="chrome")
+        leased = self.pool.lease(browserName="firefox")
+        self.pool.close()
+        self.assertTrue(all(driver.quit.called for driver in self.drivers if driver is not leased))
+        self.pool.release(leased)
+        self.assertTrue(leased.quit.called)
+
+    def test_selenium_helpers_use_pool(self):
+        sh = selenium_helpers.SeleniumHelpers(driver_pool=self.pool)
+        driver = sh.create_driver(browserName="chrome")
+        self.assertEqual(sh.desired_capabilities, {"browserName": "chrome"})
+        sh.quit_driver()
+        self.assertFalse(driver.quit.called)
+        self.assertIs(selenium_helpers.SeleniumHelpers(driver_pool=self.pool).create_driver(browserName="chrome"),
+                      driver)
+
+    def test_selenium_helpers_pool_error(self):
+        self.pool.driver_factory = Mock(side_effect=Exception("Boo!"))
+        sh = selenium_helpers.SeleniumHelpers(driver_pool=self.pool)
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.create_driver, browserName="chrome")
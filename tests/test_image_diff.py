@@ -0,0 +1,89 @@
+import numpy
+import os
+import unittest
+
+from PIL import Image
+from StringIO import StringIO
+from the_ark.image_diff import compare_images, tile_hashes, ImageDiff, ImageDiffException
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+SCREENSHOT_TEST_PNG = '{0}/etc/test.png'.format(ROOT)
+
+
+class ImageDiffTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.pixels = numpy.random.RandomState(0).randint(0, 256, (100, 150, 3)).astype(numpy.uint8)
+        self.baseline = Image.fromarray(self.pixels)
+
+    def changed_image(self, *boxes):
+        pixels = self.pixels.copy()
+        for left, top, right, bottom in boxes:
+            pixels[top:bottom, left:right] = 255 - pixels[top:bottom, left:right]
+        return Image.fromarray(pixels)
+
+    def test_matching_images(self):
+        image_diff = compare_images(self.baseline, Image.fromarray(self.pixels.copy()))
+        self.assertTrue(image_diff.matches)
+        self.assertEqual(image_diff.changed_boxes, [])
+        self.assertEqual(image_diff.mismatch_percentage, 0.0)
+        self.assertIsNone(image_diff.diff_image)
+
+    def test_changed_regions(self):
+        image_diff = compare_images(self.baseline, self.changed_image((10, 5, 20, 15), (100, 60, 140, 90)),
+                                    tile_size=16)
+        self.assertEqual(image_diff.changed_boxes, [(10, 5, 20, 15), (100, 60, 140, 90)])
+        self.assertEqual(image_diff.changed_pixels, 100 + 1200)
+        self.assertAlmostEqual(image_diff.mismatch_percentage, 100.0 * 1300 / 15000)
+
+    def test_region_across_tiles_is_one_box(self):
+        image_diff = compare_images(self.baseline, self.changed_image((30, 30, 70, 70)), tile_size=16)
+        self.assertEqual(image_diff.changed_boxes, [(30, 30, 70, 70)])
+
+    def test_single_pixel_change(self):
+        pixels = self.pixels.copy()
+        pixels[99, 149, 2] ^= 1
+        image_diff = compare_images(self.baseline, Image.fromarray(pixels))
+        self.assertEqual(image_diff.changed_boxes, [(149, 99, 150, 100)])
+        self.assertEqual(image_diff.changed_pixels, 1)
+
+    def test_different_sizes(self):
+        capture = Image.fromarray(self.pixels[:80])
+        image_diff = compare_images(self.baseline, capture)
+        self.assertEqual(image_diff.size, (150, 100))
+        self.assertEqual(image_diff.changed_boxes, [(0, 80, 150, 100)])
+        self.assertEqual(image_diff.changed_pixels, 150 * 20)
+
+    def test_highlighted_diff_image(self):
+        image_diff = compare_images(self.baseline, self.changed_image((10, 10, 20, 20)), highlight=True,
+                                    highlight_color=(0, 255, 0))
+        self.assertEqual(image_diff.diff_image.size, (150, 100))
+        diff_pixels = numpy.asarray(image_diff.diff_image)
+        self.assertTrue((diff_pixels[10:20, 10:20] == (0, 255, 0)).all())
+        self.assertTrue(numpy.array_equal(diff_pixels[50:], self.pixels[50:]))
+
+    def test_compare_files(self):
+        baseline_file = StringIO()
+        self.baseline.save(baseline_file, "PNG")
+        self.assertTrue(compare_images(baseline_file, SCREENSHOT_TEST_PNG).changed_pixels > 0)
+        self.assertTrue(compare_images(SCREENSHOT_TEST_PNG, SCREENSHOT_TEST_PNG).matches)
+
+    def test_different_modes(self):
+        self.assertTrue(compare_images(self.baseline, self.baseline.convert("RGBA")).matches)
+
+    def test_tile_hashes(self):
+        hashes = tile_hashes(self.pixels, 64)
+        self.assertEqual(hashes.shape, (2, 3))
+        swapped = self.pixels.copy()
+        swapped[0, 0], swapped[0, 1] = self.pixels[0, 1], self.pixels[0, 0]
+        changed = tile_hashes(swapped, 64) != hashes
+        self.assertEqual(changed.tolist(), [[True, False, False], [False, False, False]])
+
+    def test_invalid_tile_size(self):
+        self.assertRaises(ImageDiffException, compare_images, self.baseline, self.baseline, 0)
+
+    def test_invalid_image(self):
+        self.assertRaises(ImageDiffException, compare_images, StringIO("not an image"), self.baseline)
+
+    def test_image_diff_repr(self):
+        self.assertEqual(repr(ImageDiff((10, 10), [(0, 0, 1, 1)], 1)), "ImageDiff(1.0000% changed, 1 regions)")
@@ -0,0 +1,62 @@
+import numpy
+import os
+import unittest
+
+from PIL import Image
+from StringIO import StringIO
+from the_ark import image_encoders
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+SCREENSHOT_TEST_PNG = '{0}/etc/test.png'.format(ROOT)
+
+
+class ImageEncodersTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.image = Image.open(SCREENSHOT_TEST_PNG)
+
+    def encode(self, encoder):
+        image_file = StringIO()
+        encoder.encode(self.image, image_file)
+        image_file.seek(0)
+        return Image.open(image_file)
+
+    def test_default_encoder_is_png(self):
+        encoder = image_encoders.get_encoder()
+        self.assertEqual(encoder.file_extension, "png")
+        self.assertTrue(encoder.keep_browser_png)
+        self.assertEqual(encoder.save_options, {})
+
+    def test_presets(self):
+        for preset, image_format in [(image_encoders.PNG_PRESET, "PNG"),
+                                     (image_encoders.PNG_FAST_PRESET, "PNG"),
+                                     (image_encoders.WEBP_LOSSLESS_PRESET, "WEBP"),
+                                     (image_encoders.JPEG_PRESET, "JPEG")]:
+            self.assertEqual(self.encode(image_encoders.get_encoder(preset)).format, image_format)
+
+    def test_png_encoder_compress_level(self):
+        encoder = image_encoders.png_encoder(compress_level=9)
+        self.assertEqual(encoder.save_options["compress_level"], 9)
+        self.assertFalse(encoder.keep_browser_png)
+        self.assertEqual(self.encode(encoder).size, self.image.size)
+
+    def test_jpeg_encoder_drops_alpha(self):
+        encoder = image_encoders.jpeg_encoder(quality=50)
+        self.assertEqual(encoder.save_options["quality"], 50)
+        self.assertEqual(self.encode(encoder).mode, "RGB")
+
+    def test_webp_encoder_is_lossless(self):
+        encoded_pixels = numpy.asarray(self.encode(image_encoders.webp_lossless_encoder()).convert("RGBA"))
+        pixels = numpy.asarray(self.image.convert("RGBA"))
+        # Fully transparent pixels may have their color dropped
+        visible = pixels[:, :, 3] > 0
+        self.assertTrue(numpy.array_equal(encoded_pixels[visible], pixels[visible]))
+
+    def test_get_encoder_passes_through_encoder(self):
+        encoder = image_encoders.ImageEncoder("BMP", "bmp")
+        self.assertIs(image_encoders.get_encoder(encoder), encoder)
+
+    def test_get_encoder_unknown_preset(self):
+        with self.assertRaises(image_encoders.ImageEncoderException) as encoder_error:
+            image_encoders.get_encoder("gif")
+        self.assertIn("webp_lossless", str(encoder_error.exception))
@@ -0,0 +1,107 @@
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+from PIL import Image
+from StringIO import StringIO
+from the_ark.png_stream import PNGStreamWriter, PNGStreamException
+
+ROOT = os.path.abspath(os.path.dirname(__file__))
+SCREENSHOT_TEST_PNG = '{0}/etc/test.png'.format(ROOT)
+
+
+class PNGStreamTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = numpy.random.RandomState(0).randint(0, 256, (40, 12, 3)).astype(numpy.uint8)
+
+    def test_write_rows_round_trip(self):
+        image_file = StringIO()
+        writer = PNGStreamWriter(image_file, 12, 40, band_height=7)
+        writer.write_rows(self.rows[:25])
+        writer.write_rows(self.rows[25:])
+        writer.close()
+
+        image_file.seek(0)
+        self.assertTrue(numpy.array_equal(numpy.asarray(Image.open(image_file)), self.rows))
+
+    def test_write_image_round_trip(self):
+        image = Image.open(SCREENSHOT_TEST_PNG)
+        image_file = StringIO()
+        writer = PNGStreamWriter(image_file, image.size[0], image.size[1], band_height=16)
+        self.assertEqual(writer.write_image(image), image.size[1])
+        writer.close()
+
+        image_file.seek(0)
+        expected = numpy.asarray(image.convert("RGB"))
+        self.assertTrue(numpy.array_equal(numpy.asarray(Image.open(image_file)), expected))
+
+    def test_write_image_box_outside_image_is_black(self):
+        image = Image.fromarray(self.rows)
+        image_file = StringIO()
+        writer = PNGStreamWriter(image_file, 12, 50)
+        writer.write_image(image, (0, -10, 12, 40))
+        writer.close()
+
+        image_file.seek(0)
+        written = numpy.asarray(Image.open(image_file))
+        self.assertFalse(written[:10].any())
+        self.assertTrue(numpy.array_equal(written[10:], self.rows))
+
+    def test_write_image_stops_at_height(self):
+        writer = PNGStreamWriter(StringIO(), 12, 30)
+        self.assertEqual(writer.write_image(Image.fromarray(self.rows)), 30)
+        writer.close()
+
+    def test_write_to_file_path(self):
+        directory = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(directory, "streamed.png")
+            writer = PNGStreamWriter(file_path, 12, 40)
+            writer.write_rows(self.rows)
+            writer.close()
+            self.assertEqual(Image.open(file_path).size, (12, 40))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_invalid_size(self):
+        with self.assertRaises(PNGStreamException):
+            PNGStreamWriter(StringIO(), 0, 40)
+
+    def test_write_rows_wrong_width(self):
+        writer = PNGStreamWriter(StringIO(), 10, 40)
+        with self.assertRaises(PNGStreamException):
+            writer.write_rows(self.rows)
+
+    def test_write_rows_past_height(self):
+        writer = PNGStreamWriter(StringIO(), 12, 20)
+        with self.assertRaises(PNGStreamException):
+            writer.write_rows(self.rows)
+
+    def test_close_missing_rows(self):
+        writer = PNGStreamWriter(StringIO(), 12, 40)
+        writer.write_rows(self.rows[:10])
+        with self.assertRaises(PNGStreamException) as stream_error:
+            writer.close()
+        self.assertIn("10 of the 40", str(stream_error.exception))
+
+    def test_context_manager_closes_png(self):
+        image_file = StringIO()
+        with PNGStreamWriter(image_file, 12, 40) as writer:
+            writer.write_rows(self.rows)
+        self.assertTrue(writer.closed)
+        image_file.seek(0)
+        self.assertEqual(Image.open(image_file).size, (12, 40))
+
+    def test_context_manager_closes_file_on_error(self):
+        directory = tempfile.mkdtemp()
+        try:
+            with self.assertRaises(ValueError):
+                with PNGStreamWriter(os.path.join(directory, "streamed.png"), 12, 40) as writer:
+                    writer.write_rows(self.rows[:10])
+                    raise ValueError("Boo!")
+            self.assertTrue(writer._file.closed)
+        finally:
+            shutil.rmtree(directory)
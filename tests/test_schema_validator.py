@@ -22,6 +22,17 @@ class SchemaTestCase(unittest.TestCase):
 
         self.assertTrue(validate(data, ACTION_SCHEMA))
 
+    def test_wait_for_network_idle_schema(self):
+        data = [
+            {
+                "action": "wait_for_network_idle",
+                "idle_ms": 250,
+                "duration": 10
+            }
+        ]
+
+        self.assertTrue(validate(data, ACTION_SCHEMA))
+
     @patch('jsonschema.validate')
     def test_schema_validation_failure(self, mock_validate):
         mock_validate.side_effect = ValidationError("invalid!")
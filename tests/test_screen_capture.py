@@ -1,9 +1,13 @@
 from mock import patch
+import numpy
 import os
 from PIL import Image
 from the_ark import selenium_helpers
-from the_ark.screen_capture import Screenshot, ScreenshotException, SeleniumError, DEFAULT_PIXEL_MATCH_OFFSET
+from the_ark.image_encoders import get_encoder, png_encoder, JPEG_PRESET, WEBP_LOSSLESS_PRESET
+from the_ark.screen_capture import Screenshot, ScreenshotException, SeleniumError, DEFAULT_PIXEL_MATCH_OFFSET, \
+    DEFAULT_SETTLE_FRAMES, find_overlap_row, frame_fingerprint, downscale_image, downscaled_size
 from StringIO import StringIO
+import types
 import unittest
 
 ROOT = os.path.abspath(os.path.dirname(__file__))
@@ -31,6 +35,10 @@ class ScreenCaptureTestCase(unittest.TestCase):
         self.instantiate_screenshot_class(self.sh)
         self.sh.load_url("file://{}".format(SELENIUM_TEST_HTML), bypass_status_code_check=True)
 
+    def tearDown(self):
+        # Stop any pipeline worker threads so they are not running while later tests patch time.sleep
+        self.sc.close_pipeline()
+
     # @patch("the_ark.selenium_helpers.SeleniumHelpers")
     def instantiate_screenshot_class(self, selenium_helper):
         self.sc = Screenshot(selenium_helper)
@@ -63,6 +71,32 @@ class ScreenCaptureTestCase(unittest.TestCase):
         self.sc.capture_page(False, 300)
         capture_paginated_page.assert_called_with(300)
 
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_window_to_position")
+    @patch("the_ark.screen_capture.Screenshot._capture_single_viewport")
+    def test_iter_paginated_page_is_lazy(self, capture_single_viewport, scroll_window):
+        capture_single_viewport.return_value = True
+        frames = self.sc.iter_paginated_page()
+        self.assertIsInstance(frames, types.GeneratorType)
+        self.assertFalse(capture_single_viewport.called)
+
+        self.assertTrue(next(frames))
+        self.assertEqual(capture_single_viewport.call_count, 1)
+        # Only the scroll to the top has happened so far
+        self.assertEqual(scroll_window.call_count, 1)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_iter_paginated_page_headless(self, get_screenshot):
+        get_screenshot.return_value = open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64")
+        self.sc.headless = True
+        self.assertEqual(len(list(self.sc.iter_paginated_page())), 4)
+
+    @patch("the_ark.screen_capture.Screenshot._iter_paginated_page")
+    def test_iter_paginated_page_screenshot_error(self, iter_paginated_page):
+        iter_paginated_page.side_effect = Exception("Boo!")
+        with self.assertRaises(ScreenshotException) as screenshot_error:
+            list(self.sc.iter_paginated_page())
+        self.assertIn("Unhandled", screenshot_error.exception.msg)
+
     # - Full Page
     @patch("the_ark.screen_capture.Screenshot._crop_and_stitch_image")
     @patch("the_ark.screen_capture.Screenshot._get_image_data")
@@ -98,6 +132,299 @@ class ScreenCaptureTestCase(unittest.TestCase):
         returned_image = self.sc.capture_page()
         self.assertIsInstance(returned_image, StringIO)
 
+    # - Headless Streaming
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_window_to_position")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_stream_vertical_images(self, get_screenshot, scroll_window):
+        tile = Image.open(SCREENSHOT_TEST_PNG)
+        get_screenshot.return_value = open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64")
+        self.sc.max_height = 225.0
+        self.sc.scale_factor = 1
+
+        returned_image = Image.open(self.sc._stream_vertical_images(500))
+        self.assertEqual(returned_image.size, (tile.size[0], 500))
+        self.assertEqual(get_screenshot.call_count, 3)
+        pixels = numpy.asarray(returned_image)
+        tile_pixels = numpy.asarray(tile.convert("RGB"))
+        self.assertTrue(numpy.array_equal(pixels[225:450], tile_pixels))
+        self.assertTrue(numpy.array_equal(pixels[450:], tile_pixels[-50:]))
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_window_to_position")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_stream_vertical_images_to_sink(self, get_screenshot, scroll_window):
+        get_screenshot.return_value = open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64")
+        self.sc.max_height = 200.0
+        sink = StringIO()
+        self.assertIs(self.sc._stream_vertical_images(300, sink), sink)
+        self.assertEqual(Image.open(StringIO(sink.getvalue())).size[1], 300)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_window_to_position")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    @patch("the_ark.screen_capture.PNGStreamWriter.abort")
+    def test_stream_vertical_images_error_aborts_writer(self, abort, get_screenshot, scroll_window):
+        get_screenshot.return_value = open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64")
+        scroll_window.side_effect = [None, Exception("Boo!")]
+        self.sc.max_height = 200.0
+        self.assertRaises(Exception, self.sc._stream_vertical_images, 300)
+        self.assertTrue(abort.called)
+
+    @patch("the_ark.screen_capture.Screenshot._get_image_data")
+    def test_capture_page_to_sink(self, image_data):
+        image_data.return_value = Image.open(SCREENSHOT_TEST_PNG)
+        sink = StringIO()
+        self.assertIs(self.sc.capture_page(True, sink=sink), sink)
+        self.assertEqual(Image.open(StringIO(sink.getvalue())).size, (300, 225))
+
+    # - Raw Image Files
+    def test_create_raw_image_file_keeps_png_bytes(self):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        image_file = self.sc._create_raw_image_file(png_bytes.encode("base64"))
+        self.assertIsInstance(image_file, StringIO)
+        self.assertEqual(image_file.getvalue(), png_bytes)
+
+    def test_create_raw_image_file_to_sink(self):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        sink = StringIO()
+        self.assertIs(self.sc._create_raw_image_file(png_bytes.encode("base64"), sink), sink)
+        self.assertEqual(sink.getvalue(), png_bytes)
+
+    @patch("the_ark.screen_capture.Screenshot._create_image_file")
+    def test_create_raw_image_file_other_extension(self, create_image_file):
+        self.sc.encoder = get_encoder(JPEG_PRESET)
+        self.sc._create_raw_image_file(open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64"))
+        self.assertTrue(create_image_file.called)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_headless_viewport_capture_is_not_reencoded(self, get_screenshot):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        get_screenshot.return_value = png_bytes.encode("base64")
+        self.sc.headless = True
+        self.assertEqual(self.sc.capture_page(True).getvalue(), png_bytes)
+
+    # - DevTools
+    def test_devtools_capture_only_for_chrome(self):
+        self.assertFalse(self.sc.devtools_capture)
+
+    def test_devtools_capture_browser_name_case(self):
+        with patch.dict(self.sh.desired_capabilities, {"browserName": "Chrome", "headless": True}):
+            self.assertTrue(Screenshot(self.sh).devtools_capture)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.resize_browser")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_cdp_command")
+    def test_headless_devtools_capture(self, execute_cdp_command, resize_browser):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        execute_cdp_command.side_effect = [{"contentSize": {"width": 300, "height": 900},
+                                            "layoutViewport": {"clientWidth": 300, "clientHeight": 225}},
+                                           {"data": png_bytes.encode("base64")}]
+        self.sc.headless = True
+        self.sc.devtools_capture = True
+        self.assertEqual(self.sc.capture_page().getvalue(), png_bytes)
+        execute_cdp_command.assert_called_with("Page.captureScreenshot", {
+            "format": "png", "captureBeyondViewport": True,
+            "clip": {"x": 0, "y": 0, "width": 300, "height": 900, "scale": 1}})
+        self.assertFalse(resize_browser.called)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_cdp_command")
+    def test_headless_devtools_capture_falls_back(self, execute_cdp_command, get_screenshot):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        execute_cdp_command.side_effect = selenium_helpers.DriverAttributeError("No DevTools")
+        get_screenshot.return_value = png_bytes.encode("base64")
+        self.sc.headless = True
+        self.sc.devtools_capture = True
+        self.assertEqual(self.sc.capture_page().getvalue(), png_bytes)
+        self.assertFalse(self.sc.devtools_capture)
+
+    @patch("the_ark.screen_capture.Screenshot._stream_vertical_images")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_cdp_command")
+    def test_headless_devtools_capture_too_tall(self, execute_cdp_command, stream_vertical_images):
+        execute_cdp_command.return_value = {"contentSize": {"width": 300, "height": 900},
+                                            "layoutViewport": {"clientWidth": 300, "clientHeight": 225}}
+        self.sc.headless = True
+        self.sc.devtools_capture = True
+        self.sc.max_height = 225.0
+        self.sc.capture_page()
+        self.assertTrue(stream_vertical_images.called)
+        self.assertTrue(self.sc.devtools_capture)
+
+    # - Encoders
+    @patch("the_ark.screen_capture.Screenshot._get_image_data")
+    def test_capture_with_jpeg_encoder(self, image_data):
+        image_data.return_value = Image.open(SCREENSHOT_TEST_PNG)
+        sc = Screenshot(self.sh, encoder=JPEG_PRESET)
+        self.assertEqual(sc.file_extenson, "jpg")
+        self.assertEqual(Image.open(sc.capture_page(True)).format, "JPEG")
+
+    @patch("the_ark.screen_capture.Screenshot._get_image_data")
+    def test_capture_with_webp_encoder(self, image_data):
+        image_data.return_value = Image.open(SCREENSHOT_TEST_PNG)
+        sc = Screenshot(self.sh, encoder=WEBP_LOSSLESS_PRESET)
+        returned_image = Image.open(sc.capture_page(True))
+        self.assertEqual(returned_image.format, "WEBP")
+        self.assertEqual(returned_image.size, image_data.return_value.size)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_headless_capture_with_png_compress_level_is_reencoded(self, get_screenshot):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        get_screenshot.return_value = png_bytes.encode("base64")
+        sc = Screenshot(self.sh, encoder=png_encoder(compress_level=9))
+        sc.headless = True
+        self.assertNotEqual(sc.capture_page(True).getvalue(), png_bytes)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.resize_browser")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_content_height")
+    def test_headless_tall_capture_with_jpeg_encoder(self, get_content_height, resize_browser):
+        get_content_height.return_value = 500
+        sc = Screenshot(self.sh, encoder=JPEG_PRESET)
+        sc.headless = True
+        sc.max_height = 225.0
+        with self.assertRaises(ScreenshotException) as screenshot_error:
+            sc.capture_page()
+        self.assertIn("PNG", screenshot_error.exception.msg)
+        self.assertFalse(resize_browser.called)
+
+    # - Downscaling
+    @patch("the_ark.screen_capture.Screenshot._get_image_data")
+    def test_capture_with_target_width(self, image_data):
+        image_data.return_value = Image.open(SCREENSHOT_TEST_PNG)
+        sc = Screenshot(self.sh, target_width=100)
+        self.assertEqual(Image.open(sc.capture_page(True)).size, (100, 75))
+
+    def test_create_raw_image_file_with_target_width(self):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        self.sc.target_width = 150
+        image_file = self.sc._create_raw_image_file(png_bytes.encode("base64"))
+        self.assertEqual(Image.open(image_file).size, (150, 113))
+
+    def test_create_raw_image_file_narrower_than_target_width(self):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        self.sc.target_width = 1000
+        self.assertEqual(self.sc._create_raw_image_file(png_bytes.encode("base64")).getvalue(), png_bytes)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_window_to_position")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_stream_vertical_images_with_target_width(self, get_screenshot, scroll_window):
+        get_screenshot.return_value = open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64")
+        self.sc.max_height = 225.0
+        self.sc.target_width = 100
+        returned_image = Image.open(self.sc._stream_vertical_images(500))
+        self.assertEqual(returned_image.size, (100, 167))
+        self.assertEqual(get_screenshot.call_count, 3)
+
+    def test_downscale_image(self):
+        image = Image.open(SCREENSHOT_TEST_PNG)
+        self.assertEqual(downscale_image(image, 100).size, (100, 75))
+        self.assertIs(downscale_image(image, None), image)
+        self.assertIs(downscale_image(image, 300), image)
+
+    def test_downscaled_size(self):
+        self.assertEqual(downscaled_size((300, 225), 150), (150, 113))
+        self.assertEqual(downscaled_size((300, 1), 100), (100, 1))
+        self.assertEqual(downscaled_size((300, 225), 400), (300, 225))
+
+    # - Responsive
+    def test_capture_responsive(self):
+        self.sh.resize_browser(400, 300)
+        with patch("the_ark.selenium_helpers.SeleniumHelpers.load_url") as load_url:
+            captures = self.sc.capture_responsive([320, 360], url="http://example.com", viewport_only=True)
+            load_url.assert_called_once_with("http://example.com")
+        self.assertEqual(list(captures), [320, 360])
+        self.assertEqual([Image.open(capture).size[0] for capture in captures.values()], [320, 360])
+        self.assertEqual(self.sh.get_window_size(), (400, 300))
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.resize_browser")
+    @patch("the_ark.screen_capture.Screenshot.capture_page")
+    def test_capture_responsive_restores_window_on_error(self, capture_page, resize_browser):
+        width, height = self.sh.get_window_size()
+        capture_page.side_effect = ScreenshotException("Boo!")
+        self.assertRaises(ScreenshotException, self.sc.capture_responsive, [320, 360])
+        resize_browser.assert_called_with(width, height)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_window_size")
+    def test_capture_responsive_selenium_error(self, get_window_size):
+        get_window_size.side_effect = selenium_helpers.ElementError("Boo!", "", "", "")
+        self.assertRaises(SeleniumError, self.sc.capture_responsive, [320])
+
+    # - Element
+    def test_capture_element(self):
+        image = Image.open(self.sc.capture_element(".scrollable"))
+        geometry = self.sh.get_element_geometry(".scrollable")
+        self.assertEqual(image.size, (geometry["width"], geometry["height"]))
+
+    @patch("the_ark.screen_capture.Screenshot._wait_for_settle")
+    def test_capture_element_out_of_view(self, wait_for_settle):
+        self.sh.resize_browser(400, 300)
+        sink = StringIO()
+        with patch("the_ark.selenium_helpers.SeleniumHelpers.resize_browser") as resize_browser:
+            self.assertIs(self.sc.capture_element(".image-scroll", sink), sink)
+            self.assertFalse(resize_browser.called)
+        # The element was below the viewport, so the page was scrolled and allowed to settle
+        self.assertTrue(wait_for_settle.called)
+        self.assertEqual(Image.open(StringIO(sink.getvalue())).size, (100, 245))
+
+    def test_capture_element_hidden(self):
+        self.assertRaises(ScreenshotException, self.sc.capture_element, ".hidden")
+
+    def test_capture_element_missing(self):
+        self.assertRaises(SeleniumError, self.sc.capture_element, ".not-real")
+
+    def test_element_crop_box(self):
+        geometry = {"left": 10, "top": -20, "width": 50, "height": 100, "scroll_x": 0, "scroll_y": 500,
+                    "viewport_width": 400, "viewport_height": 300, "device_pixel_ratio": 2}
+        # A screenshot of the viewport
+        self.assertEqual(self.sc._element_crop_box(geometry, (800, 600)), (20, 0, 120, 160))
+        # A screenshot of the whole page
+        self.assertEqual(self.sc._element_crop_box(geometry, (800, 3000)), (20, 1000, 120, 1160))
+
+    # - Pipelined
+    def test_pipelined_viewport_capture(self):
+        results = self.sc.capture_page_pipelined(True)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].get().getvalue(), self.sc.capture_page(True).getvalue())
+
+    def test_pipelined_paginated_capture_in_page_order(self):
+        self.sc.paginated = True
+        results = self.sc.capture_page_pipelined()
+        expected = [image_file.getvalue() for image_file in self.sc.capture_page()]
+        self.assertEqual([result.get().getvalue() for result in results], expected)
+        self.sc.close_pipeline()
+        self.assertIsNone(self.sc._pipeline_pool)
+
+    def test_pipelined_full_page_capture(self):
+        self.sc.headers = ["header"]
+        self.sc.footers = ["footer"]
+        results = self.sc.capture_page_pipelined()
+        self.assertEqual(results[0].get().getvalue(), self.sc.capture_page().getvalue())
+
+    def test_pipelined_context_manager_closes_pool(self):
+        with Screenshot(self.sh) as screenshot:
+            results = screenshot.capture_page_pipelined(True)
+            self.assertIsNotNone(screenshot._pipeline_pool)
+        self.assertIsNone(screenshot._pipeline_pool)
+        self.assertIsInstance(results[0].get(), StringIO)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_pipelined_headless_paginated_capture(self, get_screenshot):
+        png_bytes = open(SCREENSHOT_TEST_PNG, "rb").read()
+        get_screenshot.return_value = png_bytes.encode("base64")
+        self.sc.headless = True
+        self.sc.paginated = True
+        results = self.sc.capture_page_pipelined()
+        self.assertEqual([result.get().getvalue() for result in results], [png_bytes] * 4)
+
+    @patch("the_ark.screen_capture.Screenshot._frame_to_image")
+    def test_pipelined_capture_error(self, frame_to_image):
+        frame_to_image.side_effect = Exception("Boo!")
+        results = self.sc.capture_page_pipelined(True)
+        with self.assertRaises(ScreenshotException) as screenshot_error:
+            results[0].get()
+        self.assertIn("pipelined", screenshot_error.exception.msg)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_pipelined_capture_selenium_error(self, get_screenshot):
+        get_screenshot.side_effect = selenium_helpers.ElementError("Boo!", "", "", "")
+        self.assertRaises(SeleniumError, self.sc.capture_page_pipelined, True)
+
     # - Scrolling Element
     def test_scrolling_element_with_viewport_only(self):
         sc = Screenshot(self.sh, scroll_padding=100, file_extenson="bmp")
@@ -111,6 +438,11 @@ class ScreenCaptureTestCase(unittest.TestCase):
         self.sh.load_url(SELENIUM_TEST_HTML, bypass_status_code_check=True)
         self.assertIsInstance(sc.capture_scrolling_element(".scrollable", False), list)
 
+    def test_iter_scrolling_element(self):
+        frames = self.sc.iter_scrolling_element(".scrollable")
+        self.assertIsInstance(frames, types.GeneratorType)
+        self.assertEqual(len(list(frames)), len(self.sc.capture_scrolling_element(".scrollable")))
+
     # --- Horizontal Scrolling Element
     def test_horizontal_scrolling_element_with_viewport_only(self):
         sc = Screenshot(self.sh, scroll_padding=10, file_extenson="bmp")
@@ -124,6 +456,36 @@ class ScreenCaptureTestCase(unittest.TestCase):
         self.sh.load_url(SELENIUM_TEST_HTML, bypass_status_code_check=True)
         self.assertIsInstance(sc.capture_horizontal_scrolling_element(".image-scroll", False), list)
 
+    # - Duplicate Frames
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_an_element")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_is_element_scroll_position_at_bottom")
+    @patch("the_ark.screen_capture.Screenshot._capture_single_viewport")
+    def test_scrolling_element_stops_when_unchanged(self, capture_single_viewport, at_bottom, scroll_an_element):
+        capture_single_viewport.side_effect = lambda: StringIO(open(SCREENSHOT_TEST_PNG, "rb").read())
+        at_bottom.return_value = False
+        self.assertEqual(len(self.sc.capture_scrolling_element(".scrollable")), 1)
+        self.assertEqual(capture_single_viewport.call_count, self.sc.max_unchanged_frames + 1)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.scroll_an_element")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_is_element_scroll_position_at_most_right")
+    @patch("the_ark.screen_capture.Screenshot._capture_single_viewport")
+    def test_horizontal_scrolling_element_stops_when_unchanged(self, capture_single_viewport, at_most_right,
+                                                               scroll_an_element):
+        capture_single_viewport.side_effect = lambda: StringIO(open(SCREENSHOT_TEST_PNG, "rb").read())
+        at_most_right.return_value = False
+        self.assertEqual(len(self.sc.capture_horizontal_scrolling_element(".image-scroll")), 1)
+
+    def test_unique_frames_drops_duplicates(self):
+        first, second = open(SCREENSHOT_TEST_PNG, "rb").read(), open(SMALL_TEST_PNG, "rb").read()
+        frames = [StringIO(data) for data in (first, first, second, first, first, first, second)]
+        unique_frames = list(self.sc._unique_frames(iter(frames)))
+        self.assertEqual([frame.getvalue() for frame in unique_frames], [first, second])
+
+    def test_unique_frames_disabled(self):
+        frames = [StringIO(open(SCREENSHOT_TEST_PNG, "rb").read()) for _ in range(4)]
+        self.sc.max_unchanged_frames = 0
+        self.assertEqual(list(self.sc._unique_frames(iter(frames))), frames)
+
     @patch("PIL.Image")
     def test_mobile_device_capture(self, image_class):
         sc = Screenshot(self.sh, scroll_padding=100)
@@ -133,9 +495,76 @@ class ScreenCaptureTestCase(unittest.TestCase):
         image = sc._get_image_data()
         self.assertFalse(image_class.crop.called)
 
+    # - Image Data
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_screenshot_base64")
+    def test_get_image_data_scales_by_pixel_ratio(self, get_screenshot, execute_script):
+        get_screenshot.return_value = open(SCREENSHOT_TEST_PNG, "rb").read().encode("base64")
+        execute_script.return_value = {"scroll_x": 0, "scroll_y": 10, "viewport_width": 100, "viewport_height": 50,
+                                       "document_height": 200, "device_pixel_ratio": 2}
+        self.assertEqual(self.sc._get_image_data(viewport_only=True).size, (200, 100))
+        # The screenshot and a single script are the only round trips
+        self.assertEqual(execute_script.call_count, 1)
+
     # ===================================================================
     # --- Helper Functions
     # ===================================================================
+    # - Settle
+    @patch("time.sleep")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.wait_for_layout_to_settle")
+    def test_wait_for_settle(self, wait_for_layout_to_settle, sleep):
+        self.sc._wait_for_settle(0.5)
+        wait_for_layout_to_settle.assert_called_once_with(self.sc.settle_frames, self.sc.settle_timeout)
+        self.assertFalse(sleep.called)
+
+    @patch("time.sleep")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.wait_for_layout_to_settle")
+    def test_wait_for_settle_falls_back_to_sleep(self, wait_for_layout_to_settle, sleep):
+        wait_for_layout_to_settle.side_effect = selenium_helpers.DriverAttributeError("unknown command")
+        self.sc._wait_for_settle(0.5)
+        sleep.assert_called_once_with(0.5)
+        # The settle check is not tried again once the driver has shown it cannot run it
+        self.sc._wait_for_settle(0.5)
+        self.assertEqual(wait_for_layout_to_settle.call_count, 1)
+        self.assertEqual(sleep.call_count, 2)
+
+    @patch("time.sleep")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.wait_for_layout_to_settle")
+    def test_wait_for_settle_timed_out(self, wait_for_layout_to_settle, sleep):
+        wait_for_layout_to_settle.return_value = False
+        self.sc._wait_for_settle(0.5)
+        sleep.assert_called_once_with(0.5)
+        # A page that did not settle in time does not stop later captures from waiting for it to settle
+        wait_for_layout_to_settle.return_value = True
+        self.sc._wait_for_settle(0.5)
+        self.assertEqual(wait_for_layout_to_settle.call_count, 2)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(self.sc.settle_frames, DEFAULT_SETTLE_FRAMES)
+
+    @patch("time.sleep")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.wait_for_layout_to_settle")
+    def test_wait_for_settle_turned_off(self, wait_for_layout_to_settle, sleep):
+        sc = Screenshot(self.sh, settle_frames=0)
+        sc._wait_for_settle(0.25)
+        self.assertFalse(wait_for_layout_to_settle.called)
+        sleep.assert_called_once_with(0.25)
+
+    # - Frame Fingerprint
+    def test_frame_fingerprint_equal_images(self):
+        image_file = StringIO(open(SCREENSHOT_TEST_PNG, "rb").read())
+        self.assertEqual(frame_fingerprint(image_file), frame_fingerprint(StringIO(image_file.getvalue())))
+        self.assertEqual(image_file.tell(), 0)
+
+    def test_frame_fingerprint_scrolled_image(self):
+        pixels = numpy.random.RandomState(0).randint(0, 256, (50, 60, 3)).astype(numpy.uint8)
+        fingerprints = set()
+        for shift in (0, 1):
+            for axis in (0, 1):
+                image_file = StringIO()
+                Image.fromarray(numpy.roll(pixels, shift * 7, axis=axis)[:40, :40]).save(image_file, "PNG")
+                fingerprints.add(frame_fingerprint(image_file))
+        self.assertEqual(len(fingerprints), 3)
+
     # - Hide Elements
     def test_hide_elements(self):
         sc = Screenshot(self.sh)
@@ -217,9 +646,17 @@ class ScreenCaptureTestCase(unittest.TestCase):
         self.sc._crop_and_stitch_image(header, footer)
         self.assertEqual(sc2.pixel_match_offset, test_pixel_value)
 
-    @patch("numpy.array_equal")
-    def test_crop_and_stitch_error(self, numpy):
-        numpy.side_effect = Exception("Boo!")
+    @patch("the_ark.screen_capture.find_overlap_row")
+    def test_crop_and_stitch_given_offset(self, find_overlap_row):
+        find_overlap_row.return_value = 0
+        header = Image.open(SMALL_TEST_PNG)
+        self.sc._crop_and_stitch_image(header, Image.open(All_WHITE_TEST_PNG), header.height + 10)
+        self.assertEqual(find_overlap_row.call_args[0][2], header.height)
+        self.assertEqual(self.sc.pixel_match_offset, DEFAULT_PIXEL_MATCH_OFFSET)
+
+    @patch("the_ark.screen_capture.find_overlap_row")
+    def test_crop_and_stitch_error(self, find_overlap_row):
+        find_overlap_row.side_effect = Exception("Boo!")
 
         header = Image.open(SMALL_TEST_PNG)
         footer = Image.open(All_WHITE_TEST_PNG)
@@ -232,6 +669,32 @@ class ScreenCaptureTestCase(unittest.TestCase):
         returned_image = self.sc._crop_and_stitch_image(header, footer)
         self.assertIsInstance(returned_image, Image.Image)
 
+    # - Overlap Row
+    def test_find_overlap_row(self):
+        header = numpy.random.RandomState(0).randint(0, 256, (300, 8, 3)).astype(numpy.uint8)
+        footer = numpy.concatenate((header[150:], numpy.zeros((100, 8, 3), dtype=numpy.uint8)))
+        self.assertEqual(find_overlap_row(header, footer, 100), 150)
+
+    def test_find_overlap_row_no_match(self):
+        header = numpy.asarray(Image.open(All_BLACK_TEST_PNG))
+        footer = numpy.asarray(Image.open(All_BLACK_TEST_PNG).convert("RGBA"))
+        self.assertEqual(find_overlap_row(header, footer, 100), 0)
+
+    def test_find_overlap_row_matches_first_and_last_rows(self):
+        header = numpy.asarray(Image.open(All_WHITE_TEST_PNG))
+        footer = numpy.asarray(Image.open(WHITE_STRIPES_TEST_PNG))
+        expected_row = 0
+        for i in range(len(footer) - 99):
+            if numpy.array_equal(footer[i], header[-100]) and numpy.array_equal(footer[i + 99], header[-1]):
+                expected_row = i + 100
+                break
+        self.assertEqual(find_overlap_row(header, footer, 100), expected_row)
+
+    def test_find_overlap_row_block_past_bottom(self):
+        header = numpy.zeros((100, 4, 3), dtype=numpy.uint8)
+        footer = numpy.zeros((50, 4, 3), dtype=numpy.uint8)
+        self.assertEqual(find_overlap_row(header, footer, 100), 0)
+
     # ===================================================================
     # --- Exceptions
     # ===================================================================
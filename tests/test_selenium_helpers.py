@@ -1,8 +1,11 @@
+import json
 import os
+import shutil
+import tempfile
 import unittest
 
 from mock import patch, Mock
-from the_ark import selenium_helpers
+from the_ark import command_instrumentation, selenium_helpers
 
 ROOT = os.path.abspath(os.path.dirname(__file__))
 SELENIUM_TEST_HTML = '{0}/etc/test.html'.format(ROOT)
@@ -21,6 +24,7 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         cls.driver.quit()
 
     def setUp(self):
+        self.sh.status_code_cache.clear()
         self.sh.load_url("file://{}".format(SELENIUM_TEST_HTML), bypass_status_code_check=True)
 
     @patch("selenium.webdriver.Remote", autospec=True)
@@ -65,6 +69,51 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         sh.create_driver(browserName="firefox", headless=True)
         self.assertTrue(mock_firefox.called)
 
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_cdp_command")
+    @patch("selenium.webdriver.Chrome")
+    def test_chrome_browser_block_resources(self, mock_chrome, mock_cdp):
+        sh = selenium_helpers.SeleniumHelpers()
+        sh.create_driver(browserName="chrome", block_resources=["images", "analytics"], block_urls=["*ads.example*"])
+        options = mock_chrome.call_args[1]["chrome_options"]
+        self.assertEqual(options.experimental_options["prefs"], {"profile.managed_default_content_settings.images": 2})
+        blocked_urls = mock_cdp.call_args[0][1]["urls"]
+        self.assertIn("*.png?*", blocked_urls)
+        self.assertIn("*google-analytics.com/*", blocked_urls)
+        self.assertIn("*ads.example*", blocked_urls)
+        mock_cdp.assert_any_call("Network.enable")
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_cdp_command")
+    @patch("selenium.webdriver.Chrome")
+    def test_chrome_browser_block_urls_error(self, mock_chrome, mock_cdp):
+        mock_cdp.side_effect = selenium_helpers.DriverAttributeError("Boo!")
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.create_driver, browserName="chrome",
+                          block_urls=["*ads.example*"])
+        self.assertTrue(mock_chrome.return_value.quit.called)
+        self.assertIsNone(sh.driver)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_cdp_command")
+    @patch("selenium.webdriver.Chrome")
+    def test_chrome_browser_no_blocking(self, mock_chrome, mock_cdp):
+        sh = selenium_helpers.SeleniumHelpers()
+        sh.create_driver(browserName="chrome")
+        self.assertFalse(mock_cdp.called)
+        self.assertNotIn("prefs", mock_chrome.call_args[1]["chrome_options"].experimental_options)
+
+    @patch("selenium.webdriver.Firefox")
+    def test_firefox_browser_block_resources(self, mock_firefox):
+        sh = selenium_helpers.SeleniumHelpers()
+        sh.create_driver(browserName="firefox", block_resources=["fonts"], block_urls=["*ads.example*"])
+        preferences = mock_firefox.call_args[1]["firefox_profile"].default_preferences
+        self.assertEqual(preferences["gfx.downloadable_fonts.enabled"], False)
+        self.assertEqual(preferences["network.proxy.type"], 2)
+        self.assertIn("ads.example", preferences["network.proxy.autoconfig_url"])
+
+    def test_block_unknown_resource_invalid(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.create_driver, browserName="chrome",
+                          block_resources=["pickles"])
+
     @patch("selenium.webdriver.PhantomJS")
     def test_phantomjs_browser_valid(self, mock_phantomjs):
         mock_driver = Mock(spec=mock_phantomjs)
@@ -186,6 +235,180 @@ class SeleniumHelpersTestCase(unittest.TestCase):
     def test_load_url_invalid(self):
         self.assertRaises(selenium_helpers.DriverURLError, self.sh.load_url, url="meltmedia.com")
 
+    def browser_status_helpers(self):
+        sh = selenium_helpers.SeleniumHelpers(status_check=selenium_helpers.STATUS_CHECK_BROWSER)
+        sh.driver = self.driver
+        return sh
+
+    @patch("requests.Session.head")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_navigation_status_code")
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.get")
+    def test_load_url_browser_status_valid(self, mock_get, mock_status, mock_head):
+        mock_status.return_value = 200
+        self.browser_status_helpers().load_url("http://www.meltmedia.com")
+        mock_get.assert_called_once_with("http://www.meltmedia.com")
+        self.assertFalse(mock_head.called)
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_navigation_status_code")
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.get")
+    def test_load_url_browser_status_invalid(self, mock_get, mock_status):
+        mock_status.return_value = 404
+        self.assertRaises(selenium_helpers.DriverURLError, self.browser_status_helpers().load_url,
+                          "http://www.meltmedia.com/test")
+
+    @patch("requests.Session.head")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.get_navigation_status_code")
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.get")
+    def test_load_url_browser_status_fallback(self, mock_get, mock_status, mock_head):
+        mock_status.return_value = None
+        mock_head.return_value = Mock(status_code=200)
+        self.browser_status_helpers().load_url("http://www.meltmedia.com")
+        mock_head.assert_called_once_with("http://www.meltmedia.com", allow_redirects=True)
+
+    @patch("requests.Session.head")
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.get")
+    def test_load_url_request_status_invalid(self, mock_get, mock_head):
+        mock_head.return_value = Mock(status_code=500)
+        self.assertEqual(self.sh.status_check, selenium_helpers.STATUS_CHECK_REQUEST)
+        self.assertRaises(selenium_helpers.DriverURLError, self.sh.load_url, "http://www.meltmedia.com")
+        self.assertFalse(mock_get.called)
+
+    def test_get_navigation_status_code_unreported(self):
+        self.assertIsNone(self.sh.get_navigation_status_code())
+
+    @patch("requests.Session.get")
+    @patch("requests.Session.head")
+    def test_get_url_status_code_head_not_allowed(self, mock_head, mock_get):
+        mock_head.return_value = Mock(status_code=405)
+        mock_get.return_value = Mock(status_code=200)
+        self.assertEqual(self.sh.get_url_status_code("http://www.meltmedia.com"), 200)
+        mock_get.assert_called_once_with("http://www.meltmedia.com", stream=True)
+        self.assertTrue(mock_get.return_value.close.called)
+
+    @patch("requests.Session.head")
+    def test_get_url_status_code_cached(self, mock_head):
+        mock_head.return_value = Mock(status_code=200)
+        self.assertEqual(self.sh.get_url_status_code("http://www.meltmedia.com"), 200)
+        self.assertEqual(self.sh.get_url_status_code("http://www.meltmedia.com"), 200)
+        self.assertEqual(mock_head.call_count, 1)
+
+    @patch("requests.Session.head")
+    def test_get_url_status_code_error_not_cached(self, mock_head):
+        mock_head.side_effect = [Mock(status_code=503), Mock(status_code=404), Mock(status_code=200)]
+        self.assertEqual(self.sh.get_url_status_code("http://www.meltmedia.com"), 503)
+        self.assertEqual(self.sh.get_url_status_code("http://www.meltmedia.com"), 404)
+        self.assertEqual(self.sh.get_url_status_code("http://www.meltmedia.com"), 200)
+        self.assertEqual(mock_head.call_count, 3)
+
+    @patch("requests.Session.head")
+    def test_get_url_status_code_cache_per_instance(self, mock_head):
+        mock_head.return_value = Mock(status_code=200)
+        self.sh.get_url_status_code("http://www.meltmedia.com")
+        selenium_helpers.SeleniumHelpers().get_url_status_code("http://www.meltmedia.com")
+        self.assertEqual(mock_head.call_count, 2)
+
+    @patch("requests.Session.head")
+    def test_get_url_status_code_cache_shared(self, mock_head):
+        mock_head.return_value = Mock(status_code=200)
+        cache = selenium_helpers.StatusCodeCache()
+        selenium_helpers.SeleniumHelpers(status_code_cache=cache).get_url_status_code("http://www.meltmedia.com")
+        selenium_helpers.SeleniumHelpers(status_code_cache=cache).get_url_status_code("http://www.meltmedia.com")
+        self.assertEqual(mock_head.call_count, 1)
+
+    @patch("requests.Session.head")
+    def test_get_url_status_code_cache_disabled(self, mock_head):
+        mock_head.return_value = Mock(status_code=200)
+        sh = selenium_helpers.SeleniumHelpers(status_code_cache=False)
+        sh.get_url_status_code("http://www.meltmedia.com")
+        sh.get_url_status_code("http://www.meltmedia.com")
+        self.assertEqual(mock_head.call_count, 2)
+
+    @patch("time.time")
+    def test_status_code_cache_ttl(self, mock_time):
+        mock_time.return_value = 1000
+        cache = selenium_helpers.StatusCodeCache(ttl=60)
+        cache.set("http://www.meltmedia.com", 200)
+        mock_time.return_value = 1059
+        self.assertEqual(cache.get("http://www.meltmedia.com"), 200)
+        mock_time.return_value = 1060
+        self.assertIsNone(cache.get("http://www.meltmedia.com"))
+        self.assertEqual(len(cache), 0)
+
+    def test_status_code_cache_lru(self):
+        cache = selenium_helpers.StatusCodeCache(max_size=2)
+        cache.set("first", 200)
+        cache.set("second", 200)
+        cache.get("first")
+        cache.set("third", 404)
+        self.assertEqual(cache.get("first"), 200)
+        self.assertIsNone(cache.get("second"))
+        self.assertEqual(cache.get("third"), 404)
+
+    def test_get_page_timing_valid(self):
+        page_timing = self.sh.get_page_timing()
+        self.assertEqual(page_timing["url"], "file://{}".format(SELENIUM_TEST_HTML))
+        self.assertGreaterEqual(page_timing["load_ms"], page_timing["dom_content_loaded_ms"])
+        self.assertEqual(page_timing["largest_resources"], [])
+
+    def test_get_page_timing_invalid(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.get_page_timing)
+
+    def test_collect_page_timings(self):
+        sh = selenium_helpers.SeleniumHelpers(collect_page_timings=True)
+        sh.driver = self.driver
+        test_url = "file://{}".format(SELENIUM_TEST_HTML)
+        sh.load_url(test_url, bypass_status_code_check=True)
+        sh.load_url(test_url, bypass_status_code_check=True)
+        self.assertEqual([page_timing["url"] for page_timing in sh.page_timings], [test_url, test_url])
+        self.assertEqual(self.sh.page_timings, [])
+
+    def test_save_page_timings(self):
+        sh = selenium_helpers.SeleniumHelpers(collect_page_timings=True)
+        sh.driver = self.driver
+        sh.load_url("file://{}".format(SELENIUM_TEST_HTML), bypass_status_code_check=True)
+        directory = tempfile.mkdtemp()
+        try:
+            file_path = os.path.join(directory, "timings.jsonl")
+            sh.save_page_timings(file_path)
+            sh.save_page_timings(file_path, append=True)
+            with open(file_path) as timings_file:
+                lines = timings_file.read().splitlines()
+            self.assertEqual(len(lines), 2)
+            self.assertEqual(json.loads(lines[0])["load_ms"], sh.page_timings[0]["load_ms"])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_command_instrumentation(self):
+        instrumentation = command_instrumentation.CommandInstrumentation()
+        sh = selenium_helpers.SeleniumHelpers(command_instrumentation=instrumentation)
+        # Installs the isDisplayed atom in the page before anything is recorded
+        self.sh.resolve_element(".valid")
+        sh.driver = instrumentation.instrument(self.driver)
+        try:
+            sh.hide_element(css_selector=".valid")
+            self.driver.title
+        finally:
+            instrumentation.uninstrument(self.driver)
+        self.sh.show_element(css_selector=".valid")
+        helpers = dict((stats["helper"], stats) for stats in instrumentation.summary())
+        self.assertEqual(helpers["SeleniumHelpers.hide_element"]["command"], "executeScript")
+        self.assertEqual(helpers["SeleniumHelpers.hide_element"]["count"], 2)
+        self.assertEqual(helpers[command_instrumentation.DIRECT_HELPER]["command"], "getTitle")
+        self.assertEqual(len(helpers), 2)
+
+    @patch("selenium.webdriver.Chrome")
+    def test_create_driver_instruments_driver(self, mock_chrome):
+        instrumentation = command_instrumentation.CommandInstrumentation()
+        sh = selenium_helpers.SeleniumHelpers(command_instrumentation=instrumentation)
+        driver = sh.create_driver(browserName="chrome")
+        self.assertTrue(instrumentation.is_instrumented(driver))
+        sh.quit_driver()
+        self.assertFalse(instrumentation.is_instrumented(driver))
+
+    def test_save_page_timings_invalid(self):
+        self.assertRaises(selenium_helpers.DriverAttributeError, self.sh.save_page_timings, "/no/such/dir/timings")
+
     def test_get_current_url_valid(self):
         test_url = "https://www.meltmedia.com/"
         self.sh.load_url(test_url)
@@ -223,6 +446,37 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         sh = selenium_helpers.SeleniumHelpers()
         self.assertRaises(selenium_helpers.DriverAttributeError, sh.get_viewport_size)
 
+    def test_get_viewport_geometry_values_valid(self):
+        self.assertEqual(self.sh.get_viewport_geometry(), {"scroll_x": 0, "scroll_y": 0, "viewport_width": 400,
+                                                           "viewport_height": 300, "document_height": 849,
+                                                           "device_pixel_ratio": 1})
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    def test_get_viewport_geometry_single_script(self, mock_execute_script):
+        self.sh.get_viewport_geometry()
+        mock_execute_script.assert_called_once_with(selenium_helpers.VIEWPORT_GEOMETRY_SCRIPT)
+
+    def test_get_viewport_geometry_invalid(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.get_viewport_geometry)
+
+    def test_get_element_geometry_valid(self):
+        geometry = self.sh.get_element_geometry(".scrollable")
+        self.assertEqual((geometry["width"], geometry["height"]), (400, 300))
+        self.assertFalse(geometry["scrolled"])
+
+    def test_get_element_geometry_scroll_into_view(self):
+        geometry = self.sh.get_element_geometry(".image-scroll", scroll_into_view=True)
+        self.assertTrue(geometry["scrolled"])
+        self.assertGreater(geometry["scroll_y"], 0)
+        self.assertEqual(geometry["scroll_y"], self.sh.get_window_current_scroll_position())
+
+    def test_get_element_geometry_missing_element(self):
+        self.assertRaises(selenium_helpers.ElementError, self.sh.get_element_geometry, ".not-real")
+
+    def test_get_element_geometry_invalid(self):
+        self.assertRaises(selenium_helpers.ElementError, self.sh.get_element_geometry, "[bad selector")
+
     def test_get_current_handle_valid(self):
         self.assertTrue(self.sh.get_window_handles(get_current=True))
 
@@ -323,6 +577,56 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         self.assertRaises(selenium_helpers.ElementNotVisibleError, self.sh.ensure_element_visible,
                           css_selector=".hidden")
 
+    def test_resolve_element_valid(self):
+        web_element = self.sh.resolve_element(".valid")
+        self.assertEqual(web_element.location, {'y': 21.0, 'x': 48.0})
+
+    def test_resolve_web_element_valid(self):
+        web_element = self.sh.get_element(".valid")
+        self.assertIs(self.sh.resolve_element(web_element=web_element), web_element)
+
+    def test_resolve_element_hidden_valid(self):
+        web_element = self.sh.resolve_element(".hidden", visible=False)
+        self.assertFalse(web_element.is_displayed())
+
+    def test_resolve_element_invalid(self):
+        self.assertRaises(selenium_helpers.ElementError, self.sh.resolve_element, ".invalid")
+
+    def test_resolve_element_not_visible_invalid(self):
+        self.assertRaises(selenium_helpers.ElementNotVisibleError, self.sh.resolve_element, ".hidden")
+
+    def test_resolve_element_unexpected_invalid(self):
+        self.assertRaises(selenium_helpers.ElementError, self.sh.resolve_element, "*invalid")
+
+    def test_resolve_element_round_trips(self):
+        # The first visibility check on a page installs the isDisplayed atom
+        self.sh.resolve_element(".valid")
+        with patch.object(self.sh.driver, "execute", wraps=self.sh.driver.execute) as mock_execute:
+            self.sh.hover_on_element(".valid a")
+            self.assertEqual(mock_execute.call_count, 2)
+            mock_execute.reset_mock()
+            self.sh.hide_element(".valid")
+            self.assertEqual(mock_execute.call_count, 2)
+            mock_execute.reset_mock()
+            self.sh.get_element_size(".valid")
+            self.sh.get_element_location(".valid")
+            self.assertEqual(mock_execute.call_count, 4)
+            mock_execute.reset_mock()
+            self.sh.get_list_of_elements(".valid-list li")
+            self.assertEqual(mock_execute.call_count, 1)
+
+    def test_resolve_element_installs_is_displayed_once(self):
+        with patch.object(self.sh.driver, "execute_script", wraps=self.sh.driver.execute_script) as mock_execute:
+            self.sh.resolve_element(".hidden", visible=False)
+            self.sh.resolve_element(".valid")
+            self.sh.resolve_element(".valid")
+        scripts = [call[0][0] for call in mock_execute.call_args_list]
+        self.assertEqual(scripts, [selenium_helpers.ELEMENT_RESOLUTION_SCRIPT,
+                                   selenium_helpers.ELEMENT_RESOLUTION_SCRIPT,
+                                   selenium_helpers.INSTALL_IS_DISPLAYED_SCRIPT +
+                                   selenium_helpers.ELEMENT_RESOLUTION_SCRIPT,
+                                   selenium_helpers.ELEMENT_RESOLUTION_SCRIPT])
+
     def test_get_valid(self):
         valid_css_selector = ".valid"
         self.assertEqual(self.sh.get_element(valid_css_selector).location, {'y': 21.0, 'x': 48.0})
@@ -340,25 +644,138 @@ class SeleniumHelpersTestCase(unittest.TestCase):
     def test_get_list_of_elements_invalid(self):
         self.assertRaises(selenium_helpers.ElementError, self.sh.get_list_of_elements, ".invalid")
 
+    def test_get_list_of_elements_unexpected_invalid(self):
+        self.assertRaises(selenium_helpers.ElementError, self.sh.get_list_of_elements, "*invalid")
+
+    def caching_helpers(self):
+        sh = selenium_helpers.SeleniumHelpers(cache_elements=True)
+        sh.driver = self.driver
+        return sh
+
+    def replace_element(self, css_selector):
+        self.sh.execute_script("var element = document.querySelector(arguments[0]); "
+                               "element.parentNode.replaceChild(element.cloneNode(true), element);", css_selector)
+
+    def test_element_cache_hit(self):
+        sh = self.caching_helpers()
+        web_element = sh.get_element(".valid")
+        self.assertEqual(sh.get_element(".valid"), web_element)
+        self.assertEqual(sh.resolve_element(".valid"), web_element)
+        self.assertEqual((sh.element_cache_hits, sh.element_cache_misses), (2, 1))
+
+    def test_element_cache_disabled(self):
+        self.sh.get_element(".valid")
+        self.sh.get_element(".valid")
+        self.assertEqual((self.sh.element_cache_hits, self.sh.element_cache_misses), (0, 0))
+
+    def test_element_cache_cleared_on_navigation(self):
+        sh = self.caching_helpers()
+        sh.get_element(".valid")
+        sh.load_url("file://{}".format(SELENIUM_TEST_HTML), bypass_status_code_check=True)
+        sh.get_element(".valid")
+        self.assertEqual((sh.element_cache_hits, sh.element_cache_misses), (0, 2))
+
+    @patch("selenium.webdriver.remote.switch_to.SwitchTo.window")
+    def test_element_cache_cleared_on_window_switch(self, mock_switch):
+        sh = self.caching_helpers()
+        sh.get_element(".valid")
+        sh.switch_window_handle("handle")
+        sh.get_element(".valid")
+        self.assertEqual(sh.element_cache_misses, 2)
+
+    def test_element_cache_stale_resolve(self):
+        sh = self.caching_helpers()
+        sh.resolve_element(".valid a")
+        self.replace_element(".valid a")
+        sh.hover_on_element(".valid a")
+        self.assertEqual(sh.resolve_element(".valid a").location, self.sh.get_element(".valid a").location)
+
+    def test_element_cache_stale_recovered(self):
+        sh = self.caching_helpers()
+        location = sh.get_element_location(".scrollable")
+        self.replace_element(".scrollable")
+        self.assertEqual(sh.get_element_location(".scrollable"), location)
+        self.assertEqual(sh.element_cache_misses, 2)
+
+    def test_element_cache_stale_web_element_invalid(self):
+        sh = self.caching_helpers()
+        web_element = sh.get_element(".scrollable")
+        self.replace_element(".scrollable")
+        self.assertRaises(selenium_helpers.ElementError, sh.get_element_location, web_element=web_element)
+
+    def add_element_later(self, script, delay=300):
+        self.sh.execute_script("window.setTimeout(function() {{ {0} }}, arguments[0]);".format(script), delay)
+
+    def test_wait_present_valid(self):
+        self.add_element_later("var element = document.createElement('div'); element.className = 'later'; "
+                               "document.body.appendChild(element);")
+        self.sh.wait_for_element(".later", 5)
+        self.assertTrue(self.sh.element_exists(".later"))
+
+    def test_wait_visible_element_valid(self):
+        self.add_element_later("document.querySelector('.hidden').style.display = 'block';")
+        self.sh.wait_for_element(".hidden", 5, visible=True)
+        self.assertTrue(self.sh.get_element(".hidden").is_displayed())
+
+    def test_wait_visible_invalid(self):
+        self.assertRaises(selenium_helpers.TimeoutError, self.sh.wait_for_element, ".hidden", 1, visible=True)
+
+    def new_helpers(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        sh.driver = self.driver
+        return sh
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
     @patch("selenium.webdriver.support.expected_conditions.presence_of_element_located")
     @patch("selenium.webdriver.support.ui.WebDriverWait.until")
-    def test_wait_valid(self, mock_wait, mock_present):
+    def test_wait_valid(self, mock_wait, mock_present, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.WebDriverException("unknown command")
+        sh = self.new_helpers()
         valid_css_selector = ".valid"
-        self.sh.wait_for_element(valid_css_selector)
+        sh.wait_for_element(valid_css_selector)
         self.assertTrue(mock_wait.called)
         self.assertTrue(mock_present.called)
 
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
     @patch("selenium.webdriver.support.expected_conditions.visibility_of_element_located")
     @patch("selenium.webdriver.support.ui.WebDriverWait.until")
-    def test_wait_visible_valid(self, mock_wait, mock_visible):
+    def test_wait_visible_valid(self, mock_wait, mock_visible, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.WebDriverException("unknown command")
+        sh = self.new_helpers()
         valid_css_selector = ".valid"
-        self.sh.wait_for_element(valid_css_selector, visible=True)
+        sh.wait_for_element(valid_css_selector, visible=True)
         self.assertTrue(mock_wait.called)
         self.assertTrue(mock_visible.called)
 
     def test_wait_invalid(self):
         self.assertRaises(selenium_helpers.TimeoutError, self.sh.wait_for_element, ".invalid", 1)
 
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
+    @patch("selenium.webdriver.support.ui.WebDriverWait.until")
+    def test_wait_polling_remembered(self, mock_wait, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.UnknownMethodException("Boo!")
+        sh = self.new_helpers()
+        sh.wait_for_element(".valid")
+        sh.wait_for_element(".valid")
+        self.assertEqual(mock_execute_async_script.call_count, 1)
+        self.assertEqual(mock_wait.call_count, 2)
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
+    @patch("selenium.webdriver.support.ui.WebDriverWait.until")
+    def test_wait_error_not_polled(self, mock_wait, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.WebDriverException(
+            "Document was unloaded during execution")
+        sh = self.new_helpers()
+        self.assertRaises(selenium_helpers.ElementError, sh.wait_for_element, ".valid")
+        self.assertFalse(mock_wait.called)
+        self.assertIsNone(sh._polling_driver)
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
+    def test_wait_polling_invalid(self, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.WebDriverException("unknown command")
+        sh = self.new_helpers()
+        self.assertRaises(selenium_helpers.TimeoutError, sh.wait_for_element, ".invalid", 1)
+
     @patch("selenium.webdriver.remote.webelement.WebElement.click")
     def test_click_web_element_valid(self, mock_click):
         valid_css_selector = ".valid a"
@@ -536,13 +953,83 @@ class SeleniumHelpersTestCase(unittest.TestCase):
     def test_execute_script_unexpected_invalid(self):
         self.assertRaises(Exception, self.sh.execute_script, script="No script.")
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.set_script_timeout")
+    def test_set_script_timeout_only_when_changed(self, mock_set_script_timeout):
+        sh = selenium_helpers.SeleniumHelpers()
+        sh.driver = self.driver
+        sh.set_script_timeout(5)
+        sh.set_script_timeout(5)
+        sh.set_script_timeout(3)
+        self.assertEqual(mock_set_script_timeout.call_count, 2)
+
+    def test_set_script_timeout_invalid(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.set_script_timeout, 5)
+
+    def test_wait_for_layout_to_settle_valid(self):
+        self.assertTrue(self.sh.wait_for_layout_to_settle())
+
+    def test_wait_for_layout_to_settle_timeout(self):
+        self.assertFalse(self.sh.wait_for_layout_to_settle(1000, 0.2))
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
+    def test_wait_for_layout_to_settle_arguments(self, mock_execute_async_script):
+        self.sh.wait_for_layout_to_settle(5, 1.5)
+        mock_execute_async_script.assert_called_once_with(selenium_helpers.LAYOUT_SETTLE_SCRIPT, 5, 1500)
+        self.assertEqual(self.sh.script_timeout, 1.5 + selenium_helpers.SCRIPT_TIMEOUT_PADDING)
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
+    def test_wait_for_layout_to_settle_script_error(self, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.WebDriverException("javascript error: Boo!")
+        self.assertFalse(self.sh.wait_for_layout_to_settle())
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_async_script")
+    def test_wait_for_layout_to_settle_unsupported(self, mock_execute_async_script):
+        mock_execute_async_script.side_effect = selenium_helpers.common.exceptions.WebDriverException("unknown command")
+        self.assertRaises(selenium_helpers.DriverAttributeError, self.sh.wait_for_layout_to_settle)
+
+    def test_wait_for_layout_to_settle_invalid(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.wait_for_layout_to_settle)
+
+    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute")
+    def test_execute_cdp_command_valid(self, mock_execute):
+        mock_execute.return_value = {"value": {"data": "abc"}}
+        self.assertEqual(self.sh.execute_cdp_command("Page.captureScreenshot", {"format": "png"}), {"data": "abc"})
+        mock_execute.assert_called_once_with(selenium_helpers.CDP_COMMAND,
+                                             {"cmd": "Page.captureScreenshot", "params": {"format": "png"}})
+
+    def test_wait_for_network_idle_valid(self):
+        self.assertTrue(self.sh.wait_for_network_idle(idle_ms=100, timeout=5))
+
+    def test_wait_for_network_idle_counts_requests(self):
+        self.sh.wait_for_network_idle(idle_ms=0, timeout=5)
+        pending = self.sh.execute_script("var request = new XMLHttpRequest(); "
+                                         "request.open('GET', window.location.href); request.send(); "
+                                         "return window.__theArkNetworkMonitor.pending;")
+        self.assertEqual(pending, 1)
+        self.assertTrue(self.sh.wait_for_network_idle(idle_ms=100, timeout=5))
+        self.assertEqual(self.sh.execute_script("return window.__theArkNetworkMonitor.pending;"), 0)
+
+    def test_wait_for_network_idle_timeout(self):
+        self.sh.wait_for_network_idle(idle_ms=0, timeout=5)
+        self.sh.execute_script("window.__theArkNetworkMonitor.pending = 1;")
+        self.assertFalse(self.sh.wait_for_network_idle(idle_ms=100, timeout=0.5))
+
+    def test_wait_for_network_idle_invalid(self):
+        sh = selenium_helpers.SeleniumHelpers()
+        self.assertRaises(selenium_helpers.DriverAttributeError, sh.wait_for_network_idle)
+
+    def test_execute_cdp_command_invalid(self):
+        self.assertRaises(selenium_helpers.DriverAttributeError, self.sh.execute_cdp_command, "Page.getLayoutMetrics")
+
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_to_element_bottom_valid(self, mock_scroll_bottom):
         valid_css_selector = ".valid a"
         self.sh.scroll_to_element(css_selector=valid_css_selector, position_bottom=True)
         self.assertTrue(mock_scroll_bottom.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_to_element_middle_valid(self,  mock_scroll_middle):
         valid_css_selector = ".valid a"
         self.sh.scroll_to_element(css_selector=valid_css_selector, position_middle=True)
@@ -564,7 +1051,7 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         self.sh.scroll_to_element(web_element=web_element, offset=100)
         mock_execute_script.assert_called_once_with(self.sh, 'window.scrollTo(0, arguments[0]);', 200)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_to_element_top_valid(self, mock_scroll_top):
         valid_css_selector = ".valid a"
         self.sh.scroll_to_element(css_selector=valid_css_selector)
@@ -629,49 +1116,49 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         self.sh.scroll_an_element(web_element=web_element, scroll_top=True)
         self.assertTrue(mock_scroll_element_top.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_top_valid(self, mock_scroll_element_top):
         valid_css_selector = ".scrollable"
         self.sh.scroll_an_element(css_selector=valid_css_selector, scroll_top=True)
         self.assertTrue(mock_scroll_element_top.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_bottom_valid(self, mock_scroll_element_bottom):
         valid_css_selector = ".scrollable"
         self.sh.scroll_an_element(css_selector=valid_css_selector, scroll_bottom=True)
         self.assertTrue(mock_scroll_element_bottom.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_horizontal_valid(self, mock_scroll_element_horizontal):
         valid_css_selector = ".image-scroll"
         self.sh.scroll_an_element(css_selector=valid_css_selector, scroll_horizontal=True)
         self.assertTrue(mock_scroll_element_horizontal.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_left_valid(self, mock_scroll_element_horizontal):
         valid_css_selector = ".image-scroll"
         self.sh.scroll_an_element(css_selector=valid_css_selector, scroll_left=True)
         self.assertTrue(mock_scroll_element_horizontal.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_right_valid(self, mock_scroll_element_horizontal):
         valid_css_selector = ".image-scroll"
         self.sh.scroll_an_element(css_selector=valid_css_selector, scroll_right=True)
         self.assertTrue(mock_scroll_element_horizontal.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_y_position_valid(self, mock_scroll_element_vertical):
         valid_css_selector = ".scrollable"
         self.sh.scroll_an_element(css_selector=valid_css_selector, y_position=50)
         self.assertTrue(mock_scroll_element_vertical.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_x_position_valid(self, mock_scroll_element_horizontal):
         valid_css_selector = ".image-scroll"
         self.sh.scroll_an_element(css_selector=valid_css_selector, x_position=50)
         self.assertTrue(mock_scroll_element_horizontal.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_scroll_element_valid(self, mock_scroll_element_padding):
         valid_css_selector = ".scrollable"
         self.sh.scroll_an_element(css_selector=valid_css_selector, scroll_padding=5)
@@ -809,7 +1296,7 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         self.sh.hide_element(web_element=web_element)
         self.assertTrue(mock_hide.called)
 
-    @patch("selenium.webdriver.remote.webdriver.WebDriver.execute_script")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.execute_script")
     def test_hide_element_valid(self, mock_hide):
         valid_css_selector = ".valid"
         self.sh.hide_element(css_selector=valid_css_selector)
@@ -878,9 +1365,9 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         self.assertRaises(selenium_helpers.SeleniumHelperExceptions, self.sh.get_element_size,
                           css_selector=".invalid a")
 
-    @patch("the_ark.selenium_helpers.SeleniumHelpers.element_exists")
-    def test_get_element_size_generic_error(self, mock_exists):
-        mock_exists.side_effect = Exception("Boo!")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.resolve_element")
+    def test_get_element_size_generic_error(self, mock_resolve):
+        mock_resolve.side_effect = Exception("Boo!")
         self.assertRaises(Exception, self.sh.get_element_size,
                           css_selector=".valid a")
 
@@ -906,9 +1393,9 @@ class SeleniumHelpersTestCase(unittest.TestCase):
         self.assertRaises(selenium_helpers.SeleniumHelperExceptions, self.sh.get_element_location,
                           css_selector=".invalid a")
 
-    @patch("the_ark.selenium_helpers.SeleniumHelpers.element_exists")
-    def test_get_element_location_generic_error(self, mock_exists):
-        mock_exists.side_effect = Exception("Boo!")
+    @patch("the_ark.selenium_helpers.SeleniumHelpers.resolve_element")
+    def test_get_element_location_generic_error(self, mock_resolve):
+        mock_resolve.side_effect = Exception("Boo!")
         self.assertRaises(Exception, self.sh.get_element_location,
                           css_selector=".valid a")
 
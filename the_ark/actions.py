@@ -181,6 +181,12 @@ class Actions:
     def wait_for_element(self, action, element=None):
         self.sh.wait_for_element(action[CSS_SELECTOR_KEY], action.get(DURATION_KEY, 15))
 
+    def wait_for_network_idle(self, action, element=None):
+        duration = action.get(DURATION_KEY, 15)
+        if not self.sh.wait_for_network_idle(action.get(IDLE_MS_KEY, 500), duration):
+            message = "The network was still busy after waiting {0} seconds".format(duration)
+            raise ActionException(message)
+
     def send_special_key(self, action, element=None):
         self.sh.send_special_key(action[SPECIAL_KEY_KEY])
 
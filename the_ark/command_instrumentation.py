@@ -0,0 +1,249 @@
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+
+from the_ark.selenium_helpers import DriverExceptions
+
+# The upper bound, in milliseconds, of each latency bucket. Slower commands fall into a final overflow bucket.
+DEFAULT_LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# The modules whose methods a command is attributed to
+DEFAULT_HELPER_MODULES = ("the_ark.selenium_helpers", "the_ark.screen_capture")
+# The helper recorded for commands sent by code outside the helper modules
+DIRECT_HELPER = "<direct>"
+
+
+def payload_size(payload):
+    """
+    The size of a command's parameters or response as the JSON sent over the wire. Strings, such as the base64 of a
+    screenshot, are measured without serializing them again.
+    :param
+        - payload:  object - The parameters or response of a WebDriver command
+    :return
+        - size:     int - The size in bytes
+    """
+    if payload is None:
+        return 0
+    if isinstance(payload, basestring):
+        return len(payload)
+    try:
+        return len(json.dumps(payload, default=str))
+    except Exception:
+        return len(str(payload))
+
+
+class CommandStats(object):
+    """
+    The commands of one name sent by one helper: how many were sent, how long they took and how much data they moved.
+    """
+    def __init__(self, command, helper, bucket_bounds):
+        self.command = command
+        self.helper = helper
+        self.bucket_bounds = bucket_bounds
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.histogram = [0] * (len(bucket_bounds) + 1)
+
+    def add(self, latency_ms, request_bytes, response_bytes, failed):
+        self.count += 1
+        self.errors += 1 if failed else 0
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        for index, bound in enumerate(self.bucket_bounds):
+            if latency_ms <= bound:
+                break
+        else:
+            index = len(self.bucket_bounds)
+        self.histogram[index] += 1
+
+    def to_dict(self):
+        labels = ["<={0}ms".format(bound) for bound in self.bucket_bounds]
+        labels.append(">{0}ms".format(self.bucket_bounds[-1]))
+        return {"command": self.command,
+                "helper": self.helper,
+                "count": self.count,
+                "errors": self.errors,
+                "total_ms": self.total_ms,
+                "mean_ms": self.total_ms / self.count if self.count else 0.0,
+                "max_ms": self.max_ms,
+                "request_bytes": self.request_bytes,
+                "response_bytes": self.response_bytes,
+                "histogram": [[label, count] for label, count in zip(labels, self.histogram)]}
+
+
+class CommandInstrumentation(object):
+    """
+    Records every command an instrumented driver sends to the browser, and which helper sent it, so the helpers that
+    dominate the time of a run can be found. Every WebDriver command, including those sent through WebElements, goes
+    through the driver's execute() method, which instrument() wraps. One instance can record the drivers of many
+    helpers and threads at once.
+    """
+    def __init__(self, bucket_bounds=DEFAULT_LATENCY_BUCKETS, helper_modules=DEFAULT_HELPER_MODULES):
+        """
+        :param
+            - bucket_bounds:    tuple - The upper bound, in milliseconds, of each latency bucket, in increasing order
+            - helper_modules:   tuple - The modules whose methods a command is attributed to. A command is recorded
+                                    against the outermost method of these modules that led to it, so a helper that
+                                    calls other helpers is charged for all of their commands.
+        """
+        self.log = logging.getLogger(self.__class__.__name__)
+        self.bucket_bounds = tuple(bucket_bounds)
+        self.helper_modules = tuple(helper_modules)
+        self._stats = {}
+        self._instrumented = {}
+        self._lock = threading.Lock()
+
+    def instrument(self, driver):
+        """
+        Starts recording the commands the driver sends. Instrumenting a driver twice has no effect.
+        :param
+            - driver:   WebDriver - The driver to record
+        :return
+            - driver:   WebDriver - The same driver
+        """
+        with self._lock:
+            if id(driver) in self._instrumented:
+                return driver
+            execute = driver.execute
+            # Remember whether execute() was already replaced on the driver, so it can be put back as it was found
+            self._instrumented[id(driver)] = (execute, "execute" in vars(driver))
+
+        def instrumented_execute(driver_command, params=None):
+            helper = self.calling_helper(sys._getframe(1))
+            failed = True
+            response = None
+            start = time.time()
+            try:
+                response = execute(driver_command, params)
+                failed = False
+                return response
+            finally:
+                latency_ms = (time.time() - start) * 1000
+                value = response.get("value") if isinstance(response, dict) else response
+                self.record(driver_command, helper, latency_ms, payload_size(params), payload_size(value), failed)
+
+        driver.execute = instrumented_execute
+        return driver
+
+    def uninstrument(self, driver):
+        """
+        Stops recording the commands the driver sends. What has been recorded so far is kept.
+        :param
+            - driver:   WebDriver - A driver given to instrument()
+        """
+        with self._lock:
+            execute, replaced = self._instrumented.pop(id(driver), (None, False))
+        if replaced:
+            driver.execute = execute
+        elif execute is not None:
+            del driver.execute
+
+    def is_instrumented(self, driver):
+        with self._lock:
+            return id(driver) in self._instrumented
+
+    def calling_helper(self, frame):
+        """
+        Finds the helper a command was sent from by walking outward from the frame that sent it, past the selenium
+        frames, through the frames of the helper modules, stopping at the first frame outside of them.
+        :param
+            - frame:    frame - The frame that called the driver's execute() method
+        :return
+            - helper:   string - The helper as "Class.method", or DIRECT_HELPER when no helper sent the command
+        """
+        helper = None
+        while frame is not None:
+            if frame.f_globals.get("__name__") in self.helper_modules:
+                name = frame.f_code.co_name
+                instance = frame.f_locals.get("self")
+                # Decorator wrappers and module functions are passed over, the method they wrap is recorded
+                if instance is not None and hasattr(instance.__class__, name):
+                    helper = "{0}.{1}".format(instance.__class__.__name__, name)
+            elif helper is not None:
+                break
+            frame = frame.f_back
+        return helper or DIRECT_HELPER
+
+    def record(self, command, helper, latency_ms, request_bytes=0, response_bytes=0, failed=False):
+        """
+        Adds one command to the statistics of its command name and helper.
+        """
+        with self._lock:
+            key = (command, helper)
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = CommandStats(command, helper, self.bucket_bounds)
+            stats.add(latency_ms, request_bytes, response_bytes, failed)
+
+    def summary(self):
+        """
+        The statistics of every command name and helper, the most total time first.
+        :return
+            - summary:  list - A dictionary for each command name and helper with its count, errors, total, mean and
+                            maximum latency in milliseconds, request and response bytes and latency histogram
+        """
+        with self._lock:
+            summary = [stats.to_dict() for stats in self._stats.values()]
+        return sorted(summary, key=lambda stats: (-stats["total_ms"], stats["helper"], stats["command"]))
+
+    def helper_totals(self):
+        """
+        The statistics of every helper across all of its commands, the most total time first.
+        :return
+            - totals:   list - A dictionary for each helper with its command count, errors, total latency in
+                            milliseconds and request and response bytes
+        """
+        totals = {}
+        for stats in self.summary():
+            total = totals.setdefault(stats["helper"], {"helper": stats["helper"], "count": 0, "errors": 0,
+                                                        "total_ms": 0.0, "request_bytes": 0, "response_bytes": 0})
+            for key in ("count", "errors", "total_ms", "request_bytes", "response_bytes"):
+                total[key] += stats[key]
+        return sorted(totals.values(), key=lambda total: (-total["total_ms"], total["helper"]))
+
+    def report(self):
+        """
+        The statistics as a table to print at the end of a run, one line for each command name and helper.
+        """
+        lines = ["{0:<48} {1:<28} {2:>7} {3:>11} {4:>9} {5:>9} {6:>12}".format(
+            "helper", "command", "count", "total ms", "mean ms", "max ms", "bytes")]
+        for stats in self.summary():
+            lines.append("{helper:<48} {command:<28} {count:>7} {total_ms:>11.1f} {mean_ms:>9.1f} {max_ms:>9.1f} "
+                         "{0:>12}".format(stats["request_bytes"] + stats["response_bytes"], **stats))
+        return "\n".join(lines)
+
+    def dump(self, file_path):
+        """
+        Saves the statistics of every command name and helper, and the totals of every helper, as JSON.
+        :param
+            - file_path:    string - The file the statistics are saved to
+        """
+        try:
+            with open(file_path, "w") as dump_file:
+                json.dump({"bucket_bounds_ms": list(self.bucket_bounds),
+                           "helpers": self.helper_totals(),
+                           "commands": self.summary()}, dump_file, indent=2, sort_keys=True)
+        except Exception as dump_error:
+            message = "Unable to save the command statistics to '{0}'.\n" \
+                      "{1}".format(file_path, dump_error)
+            raise CommandInstrumentationError(msg=message, stacktrace=traceback.format_exc())
+
+    def reset(self):
+        """
+        Forgets every command recorded so far. Instrumented drivers keep being recorded.
+        """
+        with self._lock:
+            self._stats = {}
+
+
+class CommandInstrumentationError(DriverExceptions):
+    def __init__(self, msg, stacktrace=None):
+        super(CommandInstrumentationError, self).__init__(msg=msg, stacktrace=stacktrace)
@@ -0,0 +1,236 @@
+import json
+import logging
+import threading
+import time
+import traceback
+
+from the_ark.selenium_helpers import SeleniumHelpers, DriverExceptions
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_MAX_AGE = 1800
+BLANK_PAGE = "about:blank"
+CLEAR_STORAGE_SCRIPT = """
+try { window.localStorage.clear(); } catch (error) {}
+try { window.sessionStorage.clear(); } catch (error) {}
+"""
+
+
+def capabilities_signature(desired_capabilities):
+    """
+    Reduces a set of desired capabilities to a string, so drivers created with equal capabilities share a signature.
+    :param
+        - desired_capabilities:     dict - The capabilities given to create_driver
+    :return
+        - signature:    string - The capabilities as sorted JSON
+    """
+    return json.dumps(desired_capabilities, sort_keys=True, default=str)
+
+
+def create_driver(**desired_capabilities):
+    """
+    Creates a new driver with SeleniumHelpers.create_driver, the default way a DriverPool creates drivers.
+    """
+    return SeleniumHelpers().create_driver(**desired_capabilities)
+
+
+class PooledDriver(object):
+    """
+    A driver held by a DriverPool, along with the signature of the capabilities it was created with, when it was
+    created and the (width, height) of its window at the time.
+    """
+    def __init__(self, driver, signature, created, window_size=None):
+        self.driver = driver
+        self.signature = signature
+        self.created = created
+        self.window_size = window_size
+
+
+class DriverPool(object):
+    """
+    Keeps browser sessions warm so that they can be leased by one test after another instead of starting a new browser
+    each time. Sessions are grouped by the desired capabilities they were created with, and are reset when they are
+    returned to the pool.
+    """
+    def __init__(self, size=DEFAULT_POOL_SIZE, max_age=DEFAULT_MAX_AGE, driver_factory=create_driver):
+        """
+        :param
+            - size:             int - The most idle sessions kept for each set of desired capabilities
+            - max_age:          int - The number of seconds a session may be used for before it is quit rather than
+                                    leased again
+            - driver_factory:   function - Called with the desired capabilities as keyword arguments to create a new
+                                    driver
+        """
+        self.log = logging.getLogger(self.__class__.__name__)
+        self.size = size
+        self.max_age = max_age
+        self.driver_factory = driver_factory
+        self._idle = {}
+        self._leased = {}
+        self._lock = threading.Lock()
+
+    def lease(self, **desired_capabilities):
+        """
+        Hands out a warm driver created with the given desired capabilities, creating a new one if none are idle.
+        Idle drivers that have passed their maximum age, or no longer respond, are quit instead of being handed out.
+        :param
+            - desired_capabilities:     dict - The capabilities the driver must have been created with
+        :return
+            - driver:   WebDriver - The leased driver. Give it back with release()
+        """
+        signature = capabilities_signature(desired_capabilities)
+        while True:
+            with self._lock:
+                idle = self._idle.get(signature)
+                pooled_driver = idle.pop() if idle else None
+
+            if pooled_driver is None:
+                pooled_driver = self._create(signature, desired_capabilities)
+                break
+            elif self._is_expired(pooled_driver) or not self._is_healthy(pooled_driver):
+                self._evict(pooled_driver)
+            else:
+                break
+
+        with self._lock:
+            self._leased[id(pooled_driver.driver)] = pooled_driver
+        return pooled_driver.driver
+
+    def release(self, driver):
+        """
+        Takes back a leased driver. The driver is reset, by clearing its cookies and storage, closing every window but
+        the first, returning the window to the size it was created with and going to a blank page, and kept for the
+        next lease. If the reset fails, the driver is too old or
+        the pool is full, it is quit instead.
+        :param
+            - driver:   WebDriver - A driver handed out by lease()
+        """
+        with self._lock:
+            pooled_driver = self._leased.pop(id(driver), None)
+
+        if pooled_driver is None:
+            message = "The driver was not leased from this pool and cannot be released to it"
+            raise DriverPoolError(msg=message)
+
+        if self._is_expired(pooled_driver) or not self._reset(pooled_driver):
+            self._evict(pooled_driver)
+            return
+
+        with self._lock:
+            idle = self._idle.setdefault(pooled_driver.signature, [])
+            if len(idle) < self.size:
+                idle.append(pooled_driver)
+                return
+
+        self._evict(pooled_driver)
+
+    def warm_up(self, **desired_capabilities):
+        """
+        Creates drivers with the given desired capabilities until the pool holds its full size of idle drivers for
+        them, so that the first leases do not have to wait for a browser to start.
+        :param
+            - desired_capabilities:     dict - The capabilities to create the drivers with
+        """
+        signature = capabilities_signature(desired_capabilities)
+        while True:
+            with self._lock:
+                if len(self._idle.get(signature, [])) >= self.size:
+                    return
+
+            pooled_driver = self._create(signature, desired_capabilities)
+            with self._lock:
+                self._idle.setdefault(signature, []).append(pooled_driver)
+
+    def idle_count(self, **desired_capabilities):
+        """
+        The number of idle drivers for the given desired capabilities, or for every set of capabilities if none are
+        given.
+        """
+        with self._lock:
+            if desired_capabilities:
+                return len(self._idle.get(capabilities_signature(desired_capabilities), []))
+            return sum(len(idle) for idle in self._idle.values())
+
+    def is_leased(self, driver):
+        """
+        Whether the driver is currently leased from this pool.
+        """
+        with self._lock:
+            return id(driver) in self._leased
+
+    def close(self):
+        """
+        Quits every idle driver. Drivers that are still leased are quit when they are released.
+        """
+        with self._lock:
+            idle_drivers = [pooled_driver for idle in self._idle.values() for pooled_driver in idle]
+            self._idle = {}
+            self.size = 0
+
+        for pooled_driver in idle_drivers:
+            self._evict(pooled_driver)
+
+    def _create(self, signature, desired_capabilities):
+        """
+        Creates a new driver and records the size of its window, so every lease starts with the same window size.
+        """
+        driver = self.driver_factory(**desired_capabilities)
+        try:
+            size = driver.get_window_size()
+            window_size = (size["width"], size["height"])
+        except Exception:
+            self.log.debug("Unable to read the window size of a new driver\n{0}".format(traceback.format_exc()))
+            window_size = None
+        return PooledDriver(driver, signature, time.time(), window_size)
+
+    def _is_expired(self, pooled_driver):
+        return self.max_age is not None and time.time() - pooled_driver.created > self.max_age
+
+    def _is_healthy(self, pooled_driver):
+        """
+        Checks that the browser still answers a command.
+        """
+        try:
+            pooled_driver.driver.current_url
+            return True
+        except Exception:
+            self.log.debug("Evicting an unresponsive driver\n{0}".format(traceback.format_exc()))
+            return False
+
+    def _reset(self, pooled_driver):
+        """
+        Returns a driver to a clean state for the next lease.
+        :return
+            - reset:    bool - Whether the driver was reset successfully
+        """
+        driver = pooled_driver.driver
+        try:
+            # Close every window but the first
+            window_handles = driver.window_handles
+            for handle in window_handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(window_handles[0])
+
+            # The last lease may have resized the window, for instance to capture the page at several widths
+            if pooled_driver.window_size is not None:
+                driver.set_window_size(*pooled_driver.window_size)
+
+            # Storage belongs to the page's origin, so it is cleared before leaving the page
+            driver.delete_all_cookies()
+            driver.execute_script(CLEAR_STORAGE_SCRIPT)
+            driver.get(BLANK_PAGE)
+            return True
+        except Exception:
+            self.log.debug("Unable to reset a released driver\n{0}".format(traceback.format_exc()))
+            return False
+
+    def _evict(self, pooled_driver):
+        try:
+            pooled_driver.driver.quit()
+        except Exception:
+            self.log.debug("Unable to quit an evicted driver\n{0}".format(traceback.format_exc()))
+
+
+class DriverPoolError(DriverExceptions):
+    def __init__(self, msg, stacktrace=None):
+        super(DriverPoolError, self).__init__(msg=msg, stacktrace=stacktrace)
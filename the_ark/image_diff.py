@@ -0,0 +1,246 @@
+import numpy
+from PIL import Image, ImageDraw
+
+DEFAULT_TILE_SIZE = 64
+DEFAULT_HIGHLIGHT_COLOR = (255, 0, 0)
+TILE_HASH_SEED = 0
+
+
+class ImageDiff(object):
+    """
+    The result of comparing a capture against its baseline.
+    """
+    def __init__(self, size, changed_boxes, changed_pixels, diff_image=None):
+        """
+        :param
+            - size:             tuple - The (width, height) area compared, big enough to hold both images
+            - changed_boxes:    list - A (left, top, right, bottom) box around each region of changed pixels
+            - changed_pixels:   int - The number of pixels that differ, counting any area only one image covers
+            - diff_image:       Image() - The capture with the changed pixels highlighted, if one was asked for
+        """
+        self.size = size
+        self.changed_boxes = changed_boxes
+        self.changed_pixels = changed_pixels
+        self.diff_image = diff_image
+
+    @property
+    def total_pixels(self):
+        return self.size[0] * self.size[1]
+
+    @property
+    def mismatch_percentage(self):
+        return 100.0 * self.changed_pixels / self.total_pixels if self.total_pixels else 0.0
+
+    @property
+    def matches(self):
+        return self.changed_pixels == 0
+
+    def __repr__(self):
+        return "ImageDiff({0:.4f}% changed, {1} regions)".format(self.mismatch_percentage, len(self.changed_boxes))
+
+
+def compare_images(baseline, capture, tile_size=DEFAULT_TILE_SIZE, highlight=False,
+                   highlight_color=DEFAULT_HIGHLIGHT_COLOR):
+    """
+    Compares a capture against a baseline image. Both images are split into square tiles and every tile is hashed in
+    one vectorized pass per image. When every hash matches the comparison ends there, otherwise only the tiles whose
+    hashes differ are compared pixel for pixel.
+    :param
+        - baseline:         Image(), string or file - The expected image, or a file path or file-like object to open
+        - capture:          Image(), string or file - The new image, or a file path or file-like object to open
+        - tile_size:        int - The width and height, in pixels, of the tiles the images are hashed in
+        - highlight:        bool - Whether to create a copy of the capture with the changed pixels highlighted
+        - highlight_color:  tuple - The (red, green, blue) color to highlight changed pixels and regions with
+    :return
+        - image_diff:   ImageDiff() - The changed regions, the mismatch percentage and the optional diff image
+    """
+    if tile_size < 1:
+        raise ImageDiffException("The tile size must be at least 1 pixel, was given {0}".format(tile_size))
+
+    baseline_image, capture_image = _matching_modes(_open_image(baseline), _open_image(capture))
+    width = min(baseline_image.size[0], capture_image.size[0])
+    height = min(baseline_image.size[1], capture_image.size[1])
+    size = (max(baseline_image.size[0], capture_image.size[0]), max(baseline_image.size[1], capture_image.size[1]))
+
+    # Only the area both images cover can be compared, anything outside of it has changed
+    baseline_array = numpy.asarray(baseline_image)[:height, :width]
+    capture_array = numpy.asarray(capture_image)[:height, :width]
+    changed_tiles = numpy.argwhere(tile_hashes(baseline_array, tile_size) != tile_hashes(capture_array, tile_size))
+
+    extra_boxes = []
+    if size[0] > width:
+        extra_boxes.append((width, 0, size[0], size[1]))
+    if size[1] > height:
+        extra_boxes.append((0, height, width, size[1]))
+
+    if not len(changed_tiles) and not extra_boxes:
+        return ImageDiff(size, [], 0, capture_image.convert("RGB") if highlight else None)
+
+    # - Find exactly which pixels changed in each tile whose hash did not match
+    changed_pixels = size[0] * size[1] - width * height
+    changed_mask = numpy.zeros((size[1], size[0]), dtype=bool) if highlight else None
+    tile_boxes = {}
+    for tile_row, tile_column in changed_tiles:
+        top, left = tile_row * tile_size, tile_column * tile_size
+        tile_mask = baseline_array[top:top + tile_size, left:left + tile_size] != \
+            capture_array[top:top + tile_size, left:left + tile_size]
+        if tile_mask.ndim == 3:
+            tile_mask = tile_mask.any(axis=2)
+
+        rows, columns = numpy.nonzero(tile_mask)
+        if not len(rows):
+            continue
+
+        changed_pixels += len(rows)
+        tile_boxes[(tile_row, tile_column)] = (left + columns.min(), top + rows.min(),
+                                               left + columns.max() + 1, top + rows.max() + 1)
+        if highlight:
+            changed_mask[top:top + tile_size, left:left + tile_size] |= tile_mask
+
+    changed_boxes = sorted(_merge_tile_boxes(tile_boxes) + extra_boxes, key=lambda box: (box[1], box[0]))
+
+    diff_image = None
+    if highlight:
+        for left, top, right, bottom in extra_boxes:
+            changed_mask[top:bottom, left:right] = True
+        diff_image = _highlight_changes(capture_image, size, changed_mask, changed_boxes, highlight_color)
+
+    return ImageDiff(size, changed_boxes, changed_pixels, diff_image)
+
+
+def tile_hashes(pixel_array, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Hashes each square tile of an image. Every pixel is weighted by an odd number picked for its row and column in
+    the tile, so any change to a single pixel, or pixels trading places, changes the tile's hash. The image is hashed a
+    row of tiles at a time to keep the extra memory used to one row of tiles.
+    :param
+        - pixel_array:  numpy.array - The pixel rows of an image
+        - tile_size:    int - The width and height of the tiles in pixels. Tiles on the right and bottom edges may be
+                            smaller
+    :return
+        - tile_hashes:  numpy.array - A (tile rows, tile columns) array of uint64 hashes
+    """
+    height, width = pixel_array.shape[:2]
+    tile_columns = -(-width // tile_size)
+    tile_rows = -(-height // tile_size)
+    row_weights, column_weights = _tile_weights(tile_size)
+    hashes = numpy.empty((tile_rows, tile_columns), dtype=numpy.uint64)
+
+    for tile_row in range(tile_rows):
+        band = pixel_array[tile_row * tile_size:(tile_row + 1) * tile_size]
+        # Pad the band out to whole tiles so it can be summed one tile column at a time
+        packed = numpy.zeros((len(band), tile_columns * tile_size), dtype=numpy.uint64)
+        packed[:, :width] = _pack_pixels(band)
+
+        column_sums = (packed.reshape(len(band), tile_columns, tile_size) * column_weights).sum(
+            axis=2, dtype=numpy.uint64)
+        hashes[tile_row] = (column_sums * row_weights[:len(band), None]).sum(axis=0, dtype=numpy.uint64)
+
+    return hashes
+
+
+def _tile_weights(tile_size):
+    """
+    The odd weights for each row and each column of a tile. The same seed is used every time so hashes from separate
+    calls can be compared.
+    """
+    random_state = numpy.random.RandomState(TILE_HASH_SEED)
+    # Random bytes rather than randint(dtype=...), which needs numpy 1.11, read as little endian on every platform
+    weights = numpy.frombuffer(random_state.bytes(8 * 2 * tile_size), dtype="<u8").astype(numpy.uint64)
+    weights |= numpy.uint64(1)
+    return weights[:tile_size], weights[tile_size:]
+
+
+def _pack_pixels(pixel_array):
+    """
+    Packs the channels of each pixel into one uint64 so that every pixel can be weighted with a single multiply.
+    """
+    if pixel_array.ndim == 2:
+        return pixel_array.astype(numpy.uint64)
+
+    packed = numpy.zeros(pixel_array.shape[:2], dtype=numpy.uint64)
+    for channel in range(pixel_array.shape[2]):
+        packed |= pixel_array[:, :, channel].astype(numpy.uint64) << numpy.uint64(8 * channel)
+    return packed
+
+
+def _merge_tile_boxes(tile_boxes):
+    """
+    Joins the boxes of changed tiles that touch, including corner to corner, into one box per region.
+    :param
+        - tile_boxes:   dict - The box of changed pixels in each changed tile, keyed by (tile row, tile column)
+    :return
+        - boxes:    list - A (left, top, right, bottom) box for each region
+    """
+    boxes = []
+    remaining = set(tile_boxes)
+    while remaining:
+        to_visit = [remaining.pop()]
+        left, top, right, bottom = tile_boxes[to_visit[0]]
+        while to_visit:
+            tile_row, tile_column = to_visit.pop()
+            tile_left, tile_top, tile_right, tile_bottom = tile_boxes[(tile_row, tile_column)]
+            left, top = min(left, tile_left), min(top, tile_top)
+            right, bottom = max(right, tile_right), max(bottom, tile_bottom)
+
+            for row_step in (-1, 0, 1):
+                for column_step in (-1, 0, 1):
+                    neighbor = (tile_row + row_step, tile_column + column_step)
+                    if neighbor in remaining:
+                        remaining.remove(neighbor)
+                        to_visit.append(neighbor)
+
+        boxes.append((int(left), int(top), int(right), int(bottom)))
+
+    return boxes
+
+
+def _highlight_changes(capture_image, size, changed_mask, changed_boxes, highlight_color):
+    """
+    Paints the changed pixels of the capture and outlines each changed region.
+    """
+    diff_image = Image.new("RGB", size)
+    diff_image.paste(capture_image.convert("RGB"), (0, 0))
+    pixels = numpy.array(diff_image)
+    pixels[changed_mask] = highlight_color
+
+    diff_image = Image.fromarray(pixels)
+    draw = ImageDraw.Draw(diff_image)
+    for left, top, right, bottom in changed_boxes:
+        draw.rectangle((left, top, right - 1, bottom - 1), outline=highlight_color)
+    return diff_image
+
+
+def _open_image(image):
+    """
+    Returns the Image() for an image, a file path or a file-like object.
+    """
+    if isinstance(image, Image.Image):
+        return image
+
+    try:
+        if hasattr(image, "seek"):
+            image.seek(0)
+        return Image.open(image)
+    except Exception as e:
+        raise ImageDiffException("Unable to open the image '{0}' | {1}".format(image, e))
+
+
+def _matching_modes(baseline_image, capture_image):
+    """
+    Converts the images so their pixels can be compared value for value. Palette images are expanded, and images of
+    different modes are both converted to RGBA.
+    """
+    if baseline_image.mode not in ("L", "RGB", "RGBA") or baseline_image.mode != capture_image.mode:
+        baseline_image = baseline_image.convert("RGBA")
+        capture_image = capture_image.convert("RGBA")
+    return baseline_image, capture_image
+
+
+class ImageDiffException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+        super(ImageDiffException, self).__init__()
+
+    def __str__(self):
+        return "Image Diff Exception: {0}".format(self.msg)
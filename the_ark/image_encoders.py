@@ -0,0 +1,118 @@
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+FAST_PNG_COMPRESS_LEVEL = 1
+DEFAULT_JPEG_QUALITY = 85
+DEFAULT_WEBP_METHOD = 4
+
+PNG_PRESET = "png"
+PNG_FAST_PRESET = "png_fast"
+WEBP_LOSSLESS_PRESET = "webp_lossless"
+JPEG_PRESET = "jpeg"
+
+
+class ImageEncoder(object):
+    """
+    Describes how Screenshot saves an Image() to a file: the PIL format, the file extension and the options passed to
+    Image.save().
+    """
+    def __init__(self, image_format, file_extension, mode=None, keep_browser_png=False, **save_options):
+        """
+        :param
+            - image_format:     string - The PIL format name (e.g. "PNG", "WEBP", "JPEG")
+            - file_extension:   string - The extension for files made by this encoder
+            - mode:             string - If provided, images are converted to this PIL mode before saving
+            - keep_browser_png: bool - Whether a PNG returned by the browser may be kept as it is instead of being
+                                    encoded again. Only set this on PNG encoders
+            - save_options:     The keyword arguments given to Image.save() (e.g. compress_level, quality)
+        """
+        self.image_format = image_format
+        self.file_extension = file_extension
+        self.mode = mode
+        self.keep_browser_png = keep_browser_png
+        self.save_options = save_options
+
+    def encode(self, image, image_file):
+        """
+        Saves the image to the file using this encoder's format and options.
+        :param
+            - image:        Image() - The image to save
+            - image_file:   string or file - A file path or file-like object to save the image to
+        """
+        if self.mode and image.mode != self.mode:
+            image = image.convert(self.mode)
+        image.save(image_file, self.image_format, **self.save_options)
+
+    @property
+    def is_png(self):
+        return self.image_format == "PNG"
+
+    def __repr__(self):
+        return "ImageEncoder({0}, {1})".format(self.image_format, self.save_options)
+
+
+def png_encoder(compress_level=DEFAULT_PNG_COMPRESS_LEVEL):
+    """
+    PNG with a zlib compression level from 0 (fastest, largest) to 9 (slowest, smallest). The browser's PNG is
+    encoded again so that every file has the requested compression.
+    """
+    return ImageEncoder("PNG", "png", compress_level=compress_level, optimize=False)
+
+
+def png_fast_encoder():
+    """
+    PNG with PIL's optimize pass turned off and the fastest zlib level. The browser's PNG is kept as it is whenever
+    the pixels do not need to change.
+    """
+    return ImageEncoder("PNG", "png", keep_browser_png=True, compress_level=FAST_PNG_COMPRESS_LEVEL, optimize=False)
+
+
+def webp_lossless_encoder(method=DEFAULT_WEBP_METHOD):
+    """
+    Lossless WebP. The method, from 0 (fastest) to 6 (smallest), trades encode time for size. WebP images can be no
+    more than 16383 pixels in either direction.
+    """
+    return ImageEncoder("WEBP", "webp", lossless=True, quality=100, method=method)
+
+
+def jpeg_encoder(quality=DEFAULT_JPEG_QUALITY):
+    """
+    Lossy JPEG with a quality from 1 to 95. Transparency is dropped.
+    """
+    return ImageEncoder("JPEG", "jpg", mode="RGB", quality=quality)
+
+
+ENCODER_PRESETS = {
+    PNG_PRESET: lambda: ImageEncoder("PNG", "png", keep_browser_png=True),
+    PNG_FAST_PRESET: png_fast_encoder,
+    WEBP_LOSSLESS_PRESET: webp_lossless_encoder,
+    JPEG_PRESET: jpeg_encoder,
+}
+
+
+def get_encoder(encoder=None):
+    """
+    Returns the ImageEncoder for a preset name, or the encoder itself if one is given.
+    :param
+        - encoder:  string or ImageEncoder - One of the ENCODER_PRESETS names or an ImageEncoder. Defaults to "png"
+    :return
+        - encoder:  ImageEncoder - The encoder to save images with
+    """
+    if encoder is None:
+        encoder = PNG_PRESET
+
+    if isinstance(encoder, ImageEncoder):
+        return encoder
+    elif encoder in ENCODER_PRESETS:
+        return ENCODER_PRESETS[encoder]()
+
+    message = "'{0}' is not an image encoder. Use an ImageEncoder or one of the presets: {1}".format(
+        encoder, ", ".join(sorted(ENCODER_PRESETS)))
+    raise ImageEncoderException(message)
+
+
+class ImageEncoderException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+        super(ImageEncoderException, self).__init__()
+
+    def __str__(self):
+        return "Image Encoder Exception: {0}".format(self.msg)
@@ -0,0 +1,139 @@
+import numpy
+import struct
+import zlib
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PNG_SUB_FILTER = 1
+DEFAULT_COMPRESS_LEVEL = 6
+DEFAULT_BAND_HEIGHT = 256
+
+
+class PNGStreamWriter(object):
+    """
+    Writes an RGB PNG to a file, or file-like object, a band of rows at a time. Only the band being filtered and the
+    compressor's window are held in memory, so the height of the image does not change how much memory is used.
+    """
+    def __init__(self, sink, width, height, compress_level=DEFAULT_COMPRESS_LEVEL, band_height=DEFAULT_BAND_HEIGHT):
+        """
+        Writes the PNG header. The full size of the image has to be known up front because it is part of the header.
+        :param
+            - sink:             string or file - A file path, or an object with a write() method, to write the PNG to
+            - width:            int - The width of the image in pixels
+            - height:           int - The height of the image in pixels
+            - compress_level:   int - The zlib compression level, 0 (none) to 9 (smallest)
+            - band_height:      int - The number of rows converted and compressed at once
+        """
+        if width < 1 or height < 1:
+            raise PNGStreamException("A PNG must be at least 1x1 pixels, was given {0}x{1}".format(width, height))
+
+        self.width = width
+        self.height = height
+        self.band_height = band_height
+        self.rows_written = 0
+        self.closed = False
+        self._owns_file = isinstance(sink, basestring)
+        self._file = open(sink, "wb") if self._owns_file else sink
+        self._compressor = zlib.compressobj(compress_level)
+
+        self._file.write(PNG_SIGNATURE)
+        # Width, height, 8 bit depth, RGB color type, default compression, filter and interlace methods
+        self._write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def write_image(self, image, box=None):
+        """
+        Appends the rows of an Image() to the PNG. Areas of the box that fall outside of the image are written as black
+        pixels, and the box is always written at the full width of the PNG.
+        :param
+            - image:    Image() - The image to copy rows from
+            - box:      tuple - The (left, top, right, bottom) area of the image to write. Defaults to the whole image
+        :return
+            - rows:     int - The number of rows written
+        """
+        left, top, right, bottom = box if box else (0, 0, image.size[0], image.size[1])
+        right = left + self.width
+        bottom = min(bottom, top + self.height - self.rows_written)
+
+        for band_top in range(top, bottom, self.band_height):
+            band_bottom = min(band_top + self.band_height, bottom)
+            band = image.crop((left, band_top, right, band_bottom))
+            if band.mode != "RGB":
+                band = band.convert("RGB")
+            self.write_rows(numpy.asarray(band))
+
+        return max(bottom - top, 0)
+
+    def write_rows(self, rows):
+        """
+        Appends pixel rows to the PNG.
+        :param
+            - rows:     numpy.array - A (rows, width, 3) array of uint8 RGB pixels
+        """
+        if rows.shape[1:] != (self.width, 3):
+            raise PNGStreamException("Rows must have the shape (rows, {0}, 3), was given {1}".format(
+                self.width, rows.shape))
+        if self.rows_written + len(rows) > self.height:
+            raise PNGStreamException("Writing {0} rows would go past the image height of {1}".format(
+                len(rows), self.height))
+
+        # Apply the "Sub" filter to each row, storing every byte as the difference from the pixel to its left
+        pixels = rows.reshape(len(rows), -1)
+        filtered = numpy.empty((len(rows), pixels.shape[1] + 1), dtype=numpy.uint8)
+        filtered[:, 0] = PNG_SUB_FILTER
+        filtered[:, 1:4] = pixels[:, :3]
+        numpy.subtract(pixels[:, 3:], pixels[:, :-3], out=filtered[:, 4:])
+
+        self._write_data(self._compressor.compress(filtered.tostring()))
+        self.rows_written += len(rows)
+
+    def close(self):
+        """
+        Finishes the PNG. Every row of the image must have been written. A sink given as a file path is closed, a
+        file-like sink is left open for the caller.
+        """
+        try:
+            if self.rows_written != self.height:
+                raise PNGStreamException("Only {0} of the {1} rows were written to the PNG".format(
+                    self.rows_written, self.height))
+            self._write_data(self._compressor.flush())
+            self._write_chunk(b"IEND", b"")
+        finally:
+            self.abort()
+
+    def abort(self):
+        """
+        Stops writing without finishing the PNG, closing a sink given as a file path. Does nothing once the writer is
+        closed.
+        """
+        if not self.closed:
+            self.closed = True
+            if self._owns_file:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # A PNG that failed part way through is left unfinished rather than hiding the error with a short PNG error
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _write_data(self, data):
+        if data:
+            self._write_chunk(b"IDAT", data)
+
+    def _write_chunk(self, chunk_type, data):
+        self._file.write(struct.pack(">I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+class PNGStreamException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+        super(PNGStreamException, self).__init__()
+
+    def __str__(self):
+        return "PNG Stream Exception: {0}".format(self.msg)
@@ -12,6 +12,7 @@ ENTER_TEXT_ACTION = "enter_text"
 SEND_SPECIAL_KEY_ACTION = "send_special_key"
 SLEEP_ACTION = "sleep"
 WAIT_FOR_ELEMENT_ACTION = "wait_for_element"
+WAIT_FOR_NETWORK_IDLE_ACTION = "wait_for_network_idle"
 SCROLL_WINDOW_TO_POSITION_ACTION = "scroll_window_to_position"
 SCROLL_WINDOW_TO_ELEMENT_ACTION = "scroll_window_to_element"
 FOR_EACH_ACTION = "for_each"
@@ -36,6 +37,7 @@ DO_NOT_INCREMENT_KEY = "do_not_increment_element_count"
 DURATION_KEY = "duration"
 ELEMENT_KEY = "element"
 FULL_NAME_KEY = "full_name"
+IDLE_MS_KEY = "idle_ms"
 INDEX_KEY = "index"
 INPUT_KEY = "input"
 INPUT_TYPE_KEY = "input_type"
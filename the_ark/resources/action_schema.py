@@ -118,6 +118,14 @@ ACTION_SCHEMA = {
                 "required": [CSS_SELECTOR_KEY],
                 "additionalProperties": False
             },
+            {
+                "properties": {
+                    ACTION_KEY: {"enum": [WAIT_FOR_NETWORK_IDLE_ACTION]},
+                    IDLE_MS_KEY: {"type": "integer"},
+                    DURATION_KEY: {"type": "number"}
+                },
+                "additionalProperties": False
+            },
             {
                 "properties": {
                     ACTION_KEY: {"enum": [SEND_SPECIAL_KEY_ACTION]},
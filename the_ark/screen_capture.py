@@ -1,7 +1,13 @@
+from collections import OrderedDict
+import hashlib
 import math
+from multiprocessing.pool import ThreadPool
 import numpy
 from PIL import Image
-from the_ark.selenium_helpers import SeleniumHelperExceptions, ElementNotVisibleError, ElementError
+from the_ark.image_encoders import get_encoder
+from the_ark.png_stream import DEFAULT_COMPRESS_LEVEL, PNG_SIGNATURE, PNGStreamWriter
+from the_ark.selenium_helpers import SeleniumHelperExceptions, ElementNotVisibleError, ElementError, DriverExceptions, \
+    async_script_unsupported
 from StringIO import StringIO
 import time
 import traceback
@@ -11,6 +17,124 @@ SCREENSHOT_FILE_EXTENSION = "png"
 DEFAULT_PIXEL_MATCH_OFFSET = 100
 FIREFOX_HEAD_HEIGHT = 75
 MAX_IMAGE_HEIGHT = 32768.0
+# Pillow added the box filter in 3.4
+DOWNSCALE_FILTER = getattr(Image, "BOX", Image.ANTIALIAS)
+DEFAULT_SETTLE_FRAMES = 3
+DEFAULT_SETTLE_TIMEOUT = 2
+PAGINATED_SCROLL_DELAY = 0.25
+STICKY_SCROLL_DELAY = 0.5
+DEFAULT_MAX_UNCHANGED_FRAMES = 2
+DEFAULT_PIPELINE_WORKERS = 2
+
+
+def find_overlap_row(header_array, footer_array, pixel_match_offset):
+    """
+    Finds the row in the footer image at which the bottom of the header image ends. Every row of both images is hashed
+    once, the footer rows whose hashes match the first and last of the header's bottom "pixel_match_offset" rows are
+    found in bulk and only those candidates are compared pixel for pixel.
+    :param
+        - header_array:         numpy.array - The pixel rows of the image captured at the top of the page
+        - footer_array:         numpy.array - The pixel rows of the image captured at the bottom of the page
+        - pixel_match_offset:   int - The number of rows at the bottom of the header image to look for in the footer
+    :return
+        - crop_row:     int - The footer row directly below the matching block, 0 if no match was found
+    """
+    header_image_height = len(header_array)
+    if pixel_match_offset < 1 or header_image_height < pixel_match_offset or \
+            header_array.shape[1:] != footer_array.shape[1:]:
+        return 0
+
+    # Grab the last "pixel_match_offset" rows of the header image
+    header_rows = header_array[header_image_height - pixel_match_offset: header_image_height]
+    header_hashes = _hash_rows(header_rows)
+    footer_hashes = _hash_rows(footer_array)
+
+    # Only rows that leave room for the whole block below them can be the start of a match
+    last_row_index = pixel_match_offset - 1
+    number_of_starts = len(footer_hashes) - last_row_index
+    if number_of_starts < 1:
+        return 0
+
+    # A block matches when its first and last rows match the first and last header rows
+    candidates = numpy.flatnonzero((footer_hashes[:number_of_starts] == header_hashes[0]) &
+                                   (footer_hashes[last_row_index:] == header_hashes[-1]))
+
+    # Rule out hash collisions, the first verified candidate is the match
+    for i in candidates:
+        if numpy.array_equal(footer_array[i], header_rows[0]) and \
+                numpy.array_equal(footer_array[i + last_row_index], header_rows[-1]):
+            return int(i) + pixel_match_offset
+
+    return 0
+
+
+def _hash_rows(pixel_array):
+    """
+    Reduces every pixel row of an image to a single number by summing the row as the widest unsigned words that evenly
+    divide it. Equal rows always hash equally, unequal rows rarely do.
+    :param
+        - pixel_array:  numpy.array - The pixel rows of an image
+    :return
+        - row_hashes:   numpy.array - One uint64 hash per row
+    """
+    rows = numpy.ascontiguousarray(pixel_array).reshape(len(pixel_array), -1).view(numpy.uint8)
+    for word_type in (numpy.uint64, numpy.uint32, numpy.uint16):
+        if rows.shape[1] % numpy.dtype(word_type).itemsize == 0:
+            rows = rows.view(word_type)
+            break
+
+    return rows.sum(axis=1, dtype=numpy.uint64)
+
+
+def downscale_image(image, target_width):
+    """
+    Shrinks an image to the target width, keeping its aspect ratio. Whole number ratios use Image.reduce() when the
+    installed Pillow has it, and a box filter is used otherwise, so every source pixel is averaged in exactly once.
+    Pillow releases before 3.4 have no box filter and use antialiasing instead.
+    :param
+        - image:            Image() - The image to shrink
+        - target_width:     int - The width to shrink the image to. Images that are already this narrow are returned
+                                as they are
+    :return
+        - image:    Image() - The downscaled image
+    """
+    width, height = image.size
+    if not target_width or width <= target_width:
+        return image
+
+    if width % target_width == 0 and height % (width // target_width) == 0 and hasattr(image, "reduce"):
+        return image.reduce(width // target_width)
+
+    return image.resize(downscaled_size(image.size, target_width), DOWNSCALE_FILTER)
+
+
+def downscaled_size(size, target_width):
+    """
+    The (width, height) an image of the given size is shrunk to by downscale_image()
+    """
+    width, height = size
+    if not target_width or width <= target_width:
+        return size
+    return target_width, max(1, int(round(height * target_width / float(width))))
+
+
+def frame_fingerprint(image_file):
+    """
+    Reduces a captured image to a short fingerprint made from the hash of every pixel row and every pixel column. The
+    fingerprints of identical images are always equal, and a scroll in either direction changes them.
+    :param
+        - image_file:   StringIO - The saved image. It is read from the start and left at the start
+    :return
+        - fingerprint:  string - A hex digest of the image's size, row hashes and column hashes
+    """
+    image_file.seek(0)
+    pixel_array = numpy.asarray(Image.open(image_file))
+    image_file.seek(0)
+
+    fingerprint = hashlib.sha1(str(pixel_array.shape))
+    fingerprint.update(_hash_rows(pixel_array).tostring())
+    fingerprint.update(_hash_rows(pixel_array.swapaxes(0, 1)).tostring())
+    return fingerprint.hexdigest()
 
 
 class Screenshot:
@@ -19,7 +143,10 @@ class Screenshot:
     """
     def __init__(self, selenium_helper, paginated=False, header_ids=None, footer_ids=None,
                  scroll_padding=DEFAULT_SCROLL_PADDING, pixel_match_offset=DEFAULT_PIXEL_MATCH_OFFSET,
-                 file_extenson=SCREENSHOT_FILE_EXTENSION, resize_delay=0, content_container_selector="html"):
+                 file_extenson=SCREENSHOT_FILE_EXTENSION, resize_delay=0, content_container_selector="html",
+                 encoder=None, settle_frames=DEFAULT_SETTLE_FRAMES, settle_timeout=DEFAULT_SETTLE_TIMEOUT,
+                 devtools_capture=True, max_unchanged_frames=DEFAULT_MAX_UNCHANGED_FRAMES,
+                 pipeline_workers=DEFAULT_PIPELINE_WORKERS, target_width=None):
         """
         Initializes the Screenshot class. These variable will be used throughout to help determine how to capture pages
         for this website.
@@ -38,6 +165,25 @@ class Screenshot:
                                     to create an overlapping of content shown on both images to not cut any text in half
             - file_extenson:    string - If provided, this extension will be used while creating the image. This must
                                         be an extension that is usable with PIL
+            - encoder:          string or ImageEncoder - How images are saved. One of the image_encoders presets
+                                    ("png", "png_fast", "webp_lossless", "jpeg") or an ImageEncoder, such as
+                                    png_encoder(compress_level=9) or jpeg_encoder(quality=70). Defaults to "png".
+                                    Headless pages too tall for one capture are streamed a band at a time, which
+                                    only PNGs allow, so capturing them with any other encoder raises an error
+            - settle_frames:    int - After scrolling or resizing, captures wait until the scroll position and page
+                                    size have not changed for this many animation frames. Set to 0 to use fixed sleeps
+                                    (and resize_delay) instead
+            - settle_timeout:   int - The most time, in seconds, to wait for the page to settle
+            - devtools_capture: bool - Whether headless Chrome full page captures are taken with a single DevTools
+                                    screenshot of the whole page instead of resizing the window. Other browsers always
+                                    resize the window
+            - max_unchanged_frames: int - Scrolling element captures drop captures identical to an earlier one and
+                                    end once this many captures in a row are unchanged. Set to 0 to keep every capture
+            - pipeline_workers: int - The number of threads capture_page_pipelined uses to decode, crop, stitch and
+                                    encode images
+            - target_width:     int - If provided, every capture is shrunk to this width, keeping its aspect ratio,
+                                    as soon as it is decoded. Tall headless pages are shrunk a window at a time before
+                                    they are written, so the full sized page is never held in memory
         """
         # Set parameters as class variables
         self.sh = selenium_helper
@@ -47,42 +193,221 @@ class Screenshot:
         self.content_container_selector = content_container_selector
         self.scroll_padding = scroll_padding
         self.pixel_match_offset = pixel_match_offset
-        self.file_extenson = "png"
+        self.encoder = get_encoder(encoder)
+        self.file_extenson = self.encoder.file_extension
 
         self.headless = self.sh.desired_capabilities.get("headless", False)
         self.head_padding = FIREFOX_HEAD_HEIGHT if self.sh.desired_capabilities ["browserName"] == "firefox" else 0
         self.scale_factor = self.sh.desired_capabilities.get("scale_factor", 1)
         self.max_height = MAX_IMAGE_HEIGHT / self.scale_factor
         self.resize_delay = resize_delay
-
-    def capture_page(self, viewport_only=False, padding=None):
+        self.settle_frames = settle_frames
+        self.settle_timeout = settle_timeout
+        # Turned off once the driver shows it cannot run the asynchronous settle check
+        self._settle_check_supported = True
+        self.max_unchanged_frames = max_unchanged_frames
+        self.pipeline_workers = pipeline_workers
+        self._pipeline_pool = None
+        self.target_width = target_width
+        self.devtools_capture = devtools_capture and \
+            self.sh.desired_capabilities.get("browserName", "").lower() == "chrome"
+
+    def capture_page(self, viewport_only=False, padding=None, sink=None):
         """
         Entry point for a screenshot of the whole page. This will send the screenshot off to the correct methods
         depending on whether you need paginated screenshots, just the current viewport area, or the whole page in
         one large shot.
         :param
             - viewport_only:  bool - Whether to capture just the viewport's visible area or not
+            - sink:           string or file - A file path or file-like object to write the image to instead of a new
+                                StringIO. Paginated captures always return a list of StringIO objects
         :return
-            - StringIO: A StingIO object containing the captured image(s)
+            - StringIO: A StingIO object, or the given sink, containing the captured image(s)
         """
         try:
             if self.headless:
-                return self._capture_headless_page(viewport_only)
+                return self._capture_headless_page(viewport_only, sink)
             elif viewport_only:
-                return self._capture_single_viewport()
+                return self._capture_single_viewport(sink)
             elif self.paginated:
                 return self._capture_paginated_page(padding)
             else:
-                return self._capture_full_page()
+                return self._capture_full_page(sink)
 
         except SeleniumHelperExceptions as selenium_error:
             message = "A selenium issue arose while taking the screenshot".format()
             error = SeleniumError(message, selenium_error)
             raise error
+        except ScreenshotException:
+            raise
+        except Exception as e:
+            message = "Unhandled exception while taking the screenshot | {0}".format(e)
+            raise ScreenshotException(message, stacktrace=traceback.format_exc())
+
+    def iter_paginated_page(self, padding=None):
+        """
+        Captures the page viewport by viewport, like a paginated capture_page, but yields each image as soon as it is
+        captured. The caller can save or upload one image while the browser scrolls to the next, and only the images
+        the caller keeps stay in memory.
+        :param
+            - padding:  int - Overwrites the default scroll padding for the class
+        :return
+            - StringIO: generator - Yields a StringIO object for each viewport, from the top of the page down
+        """
+        try:
+            if self.headless:
+                image_files = self._iter_headless_paginated_page(padding)
+            else:
+                image_files = self._iter_paginated_page(padding)
+
+            for image_file in image_files:
+                yield image_file
+
+        except SeleniumHelperExceptions as selenium_error:
+            message = "A selenium issue arose while taking the screenshot"
+            error = SeleniumError(message, selenium_error)
+            raise error
+        except Exception as e:
+            message = "Unhandled exception while taking the screenshot | {0}".format(e)
+            raise ScreenshotException(message, stacktrace=traceback.format_exc())
+
+    def capture_responsive(self, widths, url=None, viewport_only=False, padding=None):
+        """
+        Captures the page at each of the given viewport widths while only loading it once. The window is resized from
+        one width to the next and the layout is allowed to settle before each capture. The window is returned to its
+        starting size afterwards.
+        :param
+            - widths:           list - The viewport widths, in CSS pixels, to capture the page at
+            - url:              string - If provided, this url is loaded once before the first capture. Otherwise the
+                                    page currently loaded is captured
+            - viewport_only:    bool - Whether to capture just the viewport's visible area or not
+            - padding:          int - Overwrites the default scroll padding for paginated captures
+        :return
+            - captures:     OrderedDict - The capture_page() result for each width, in the order the widths were given
+        """
+        try:
+            if url:
+                self.sh.load_url(url)
+
+            window_width, window_height = self.sh.get_window_size()
+            # The window is wider than the viewport by its frame and scrollbar
+            frame_width = window_width - self.sh.get_viewport_geometry()["viewport_width"]
+
+            captures = OrderedDict()
+            try:
+                for width in widths:
+                    self.sh.resize_browser(width + frame_width, window_height)
+                    self._wait_for_settle(self.resize_delay)
+                    captures[width] = self.capture_page(viewport_only, padding)
+            finally:
+                self.sh.resize_browser(window_width, window_height)
+
+            return captures
+
+        except SeleniumHelperExceptions as selenium_error:
+            message = "A selenium issue arose while taking the responsive screenshots"
+            error = SeleniumError(message, selenium_error)
+            raise error
+        except ScreenshotException:
+            raise
+        except Exception as e:
+            message = "Unhandled exception while taking the responsive screenshots | {0}".format(e)
+            raise ScreenshotException(message, stacktrace=traceback.format_exc(), details={"widths": widths})
+
+    def capture_element(self, css_selector, sink=None):
+        """
+        Captures just the area of the page taken up by an element. The element's position is found with a single
+        script, which also scrolls the element to the top of the viewport if any of it is out of view. Only the part of
+        the element that fits in the viewport is captured, the window is never resized.
+        :param
+            - css_selector:     string - The css selector for the element to capture
+            - sink:             string or file - A file path or file-like object to write the image to instead of a new
+                                    StringIO
+        :return
+            - StringIO: A StingIO object, or the given sink, containing the captured element
+        """
+        try:
+            geometry = self.sh.get_element_geometry(css_selector, scroll_into_view=True)
+            if geometry["scrolled"]:
+                self._wait_for_settle(PAGINATED_SCROLL_DELAY)
+
+            image = Image.open(StringIO(self.sh.get_screenshot_base64().decode('base64')))
+            return self._create_image_file(image.crop(self._element_crop_box(geometry, image.size)), sink)
+
+        except SeleniumHelperExceptions as selenium_error:
+            message = "A selenium issue arose while trying to capture the element"
+            error = SeleniumError(message, selenium_error)
+            raise error
+        except ScreenshotException:
+            raise
+        except Exception as e:
+            message = "Unhandled exception while taking the screenshot " \
+                      "of the element '{0}' | {1}".format(css_selector, e)
+            raise ScreenshotException(message,
+                                      stacktrace=traceback.format_exc(),
+                                      details={"css_selector": css_selector})
+
+    def capture_page_pipelined(self, viewport_only=False, padding=None):
+        """
+        Captures the same images as capture_page, but the thread driving the browser only grabs screenshots and
+        scrolls. Decoding, cropping, stitching and encoding run in a pool of pipeline_workers threads, so the browser
+        moves on to the next viewport while earlier ones are still being encoded. Headless full page captures are not
+        pipelined, because the page is saved as it is captured, so the result is ready before this returns.
+        The pool is kept for the next pipelined capture. Stop it with close_pipeline(), or by using the Screenshot as a
+        context manager:
+            with Screenshot(sh, paginated=True) as screenshot:
+                images = [result.get() for result in screenshot.capture_page_pipelined()]
+        :param
+            - viewport_only:  bool - Whether to capture just the viewport's visible area or not
+            - padding:        int - Overwrites the default scroll padding for paginated captures
+        :return
+            - AsyncResult:  list - One result per image, in page order. Each result's get() returns the StringIO, or
+                                raises a ScreenshotException if that image could not be created
+        """
+        try:
+            if self.headless and self.paginated and not viewport_only:
+                return [self._submit_pipeline_job(self._create_raw_image_file, image_data) for image_data in
+                        self._iter_headless_paginated_page(padding, self.sh.get_screenshot_base64)]
+            elif self.headless and viewport_only:
+                return [self._submit_pipeline_job(self._create_raw_image_file, self.sh.get_screenshot_base64())]
+            elif self.headless:
+                # The window is resized for a single screenshot that is saved as it is, there is nothing to hand off
+                image_file = self._capture_headless_page(viewport_only)
+                return [self._submit_pipeline_job(lambda: image_file)]
+            elif viewport_only:
+                return [self._submit_pipeline_job(self._viewport_from_frame, self._grab_frame())]
+            elif self.paginated:
+                return [self._submit_pipeline_job(self._viewport_from_frame, frame) for frame in
+                        self._iter_paginated_page(padding, self._grab_frame)]
+            else:
+                # The offset is read now, so the worker does not depend on the instance while it runs
+                return [self._submit_pipeline_job(self._full_page_from_frames, self._grab_full_page_frames(), None,
+                                                  self.pixel_match_offset)]
+
+        except SeleniumHelperExceptions as selenium_error:
+            message = "A selenium issue arose while taking the screenshot"
+            error = SeleniumError(message, selenium_error)
+            raise error
         except Exception as e:
             message = "Unhandled exception while taking the screenshot | {0}".format(e)
             raise ScreenshotException(message, stacktrace=traceback.format_exc())
 
+    def close_pipeline(self):
+        """
+        Waits for every pipelined image to finish and stops the worker threads. A new pool is started by the next
+        pipelined capture.
+        """
+        if self._pipeline_pool is not None:
+            self._pipeline_pool.close()
+            self._pipeline_pool.join()
+            self._pipeline_pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close_pipeline()
+
     def capture_scrolling_element(self, css_selector, viewport_only=True, scroll_padding=None):
         """
         This method will scroll an element one height (with padding) and take a screenshot each scroll until the element
@@ -97,29 +422,26 @@ class Screenshot:
         :return
             - StringIO:     list - A list containing multiple StringIO image objects
         """
+        return list(self.iter_scrolling_element(css_selector, viewport_only, scroll_padding))
+
+    def iter_scrolling_element(self, css_selector, viewport_only=True, scroll_padding=None):
+        """
+        Generator version of capture_scrolling_element. Each image is yielded as soon as it is captured, before the
+        element is scrolled for the next one, so the caller can save or upload it while the rest are captured.
+        :param
+            - css_selector:     string - The css selector for the element that you plan to scroll
+            - viewport_only:    bool   - Whether to capture just the viewport's visible area or not (each screenshot
+                                       after scrolling)
+            - scroll_padding:   int    - Overwrites the default scroll padding for the class. This can be used when the
+                                       element, or site, have greatly different scroll padding numbers
+        :return
+            - StringIO:     generator - Yields a StringIO image object for each scroll position
+        """
         padding = scroll_padding if scroll_padding else self.scroll_padding
 
         try:
-            image_list = []
-            # Scroll the element to the top
-            self.sh.scroll_an_element(css_selector, scroll_top=True)
-
-            while True:
-                if self.headless:
-                    image_list.append(self._capture_headless_page(viewport_only))
-                elif viewport_only:
-                    image_list.append(self._capture_single_viewport())
-                else:
-                    image_list.append(self._capture_full_page())
-
-                if self.sh.get_is_element_scroll_position_at_bottom(css_selector):
-                    # Stop capturing once you're at the bottom
-                    break
-                else:
-                    # Scroll down for the next one!
-                    self.sh.scroll_an_element(css_selector, scroll_padding=padding)
-
-            return image_list
+            for image_file in self._unique_frames(self._iter_scrolling_frames(css_selector, viewport_only, padding)):
+                yield image_file
 
         except SeleniumHelperExceptions as selenium_error:
             message = "A selenium issue arose while trying to capture the scrolling element"
@@ -150,25 +472,8 @@ class Screenshot:
         padding = scroll_padding if scroll_padding else self.scroll_padding
 
         try:
-            image_list = []
-            # Scroll the element to the top
-            self.sh.scroll_an_element(css_selector, scroll_left=True)
-
-            while True:
-                # - Capture the image
-                if viewport_only:
-                    image_list.append(self._capture_single_viewport())
-                else:
-                    image_list.append(self._capture_full_page())
-
-                if self.sh.get_is_element_scroll_position_at_most_right(css_selector):
-                    # - Stop capturing once you're at the most right
-                    break
-                else:
-                    # - Scroll right for the next one!
-                    self.sh.scroll_an_element(css_selector, scroll_padding=padding, scroll_horizontal=True)
-
-            return image_list
+            frames = self._iter_horizontal_scrolling_frames(css_selector, viewport_only, padding)
+            return list(self._unique_frames(frames))
 
         except SeleniumHelperExceptions as selenium_error:
             message = "A selenium issue arose while trying to capture the scrolling element"
@@ -181,16 +486,93 @@ class Screenshot:
                                       stacktrace=traceback.format_exc(),
                                       details={"css_selector": css_selector})
 
-    def _capture_single_viewport(self):
+    def _iter_scrolling_frames(self, css_selector, viewport_only, padding):
+        """
+        Scrolls the element down one height (with padding) at a time, yielding a capture at each position until the
+        element is scrolled to the bottom
+        """
+        # Scroll the element to the top
+        self.sh.scroll_an_element(css_selector, scroll_top=True)
+
+        while True:
+            if self.headless:
+                yield self._capture_headless_page(viewport_only)
+            elif viewport_only:
+                yield self._capture_single_viewport()
+            else:
+                yield self._capture_full_page()
+
+            if self.sh.get_is_element_scroll_position_at_bottom(css_selector):
+                # Stop capturing once you're at the bottom
+                break
+            else:
+                # Scroll down for the next one!
+                self.sh.scroll_an_element(css_selector, scroll_padding=padding)
+
+    def _iter_horizontal_scrolling_frames(self, css_selector, viewport_only, padding):
+        """
+        Scrolls the element right one width (with padding) at a time, yielding a capture at each position until the
+        element is scrolled to the most right
+        """
+        # Scroll the element to the left
+        self.sh.scroll_an_element(css_selector, scroll_left=True)
+
+        while True:
+            # - Capture the image
+            if viewport_only:
+                yield self._capture_single_viewport()
+            else:
+                yield self._capture_full_page()
+
+            if self.sh.get_is_element_scroll_position_at_most_right(css_selector):
+                # - Stop capturing once you're at the most right
+                break
+            else:
+                # - Scroll right for the next one!
+                self.sh.scroll_an_element(css_selector, scroll_padding=padding, scroll_horizontal=True)
+
+    def _unique_frames(self, frames):
+        """
+        Passes on the captures of a scrolling element, dropping any capture identical to one already passed on. Once
+        max_unchanged_frames captures in a row match the one before them, scrolling is no longer changing what is on
+        the screen (e.g. a sticky element or content that is still loading) and the capture is ended.
+        :param
+            - frames:   iterator - The StringIO captures, in the order they were taken
+        :return
+            - StringIO: generator - Yields each capture that has not been seen before
+        """
+        seen_fingerprints = set()
+        previous_fingerprint = None
+        unchanged_frames = 0
+
+        for image_file in frames:
+            if not self.max_unchanged_frames:
+                yield image_file
+                continue
+
+            fingerprint = frame_fingerprint(image_file)
+            if fingerprint == previous_fingerprint:
+                unchanged_frames += 1
+                if unchanged_frames >= self.max_unchanged_frames:
+                    break
+            else:
+                unchanged_frames = 0
+            previous_fingerprint = fingerprint
+
+            if fingerprint not in seen_fingerprints:
+                seen_fingerprints.add(fingerprint)
+                yield image_file
+
+    def _capture_single_viewport(self, sink=None):
         """
         Grabs an image of the page and then craps it to just the visible / viewport area
         :return
             - StringIO: A StingIO object containing the captured image
         """
         cropped_image = self._get_image_data(viewport_only=True)
-        return self._create_image_file(cropped_image)
+        return self._create_image_file(cropped_image, sink)
 
-    def _capture_full_page(self):
+    def _capture_full_page(self, sink=None):
         """
         Captures an image of the whole page. If there are sitcky elements, as specified by the footers and headers
         class variables the code will, the code will capture them only where appropriate ie. headers on top, footers on
@@ -198,38 +580,110 @@ class Screenshot:
         :return
             - StringIO: A StingIO object containing the captured image
         """
+        return self._full_page_from_frames(self._grab_full_page_frames(), sink)
+
+    def _grab_full_page_frames(self):
+        """
+        Scrolls the page and hides or shows the sticky elements for a full page capture, grabbing a frame at each step
+        :return
+            - frames:   tuple - The header and footer frames when there are both headers and footers, otherwise a
+                            single frame of the page
+        """
         if self.headers and self.footers:
             # Capture viewport size window of the headers
             self.sh.scroll_window_to_position(0)
             self._hide_elements(self.footers)
-            header_image = self._get_image_data(True)
+            header_frame = self._grab_frame()
 
             # - Capture the page from the bottom without headers
             self._show_elements(self.footers)
             #TODO: Update when scroll position updates to have a scroll to bottom option
             self.sh.scroll_window_to_position(40000)
             self._hide_elements(self.headers)
-            footer_image = self._get_image_data()
+            footer_frame = self._grab_frame()
 
             # Show all header elements again
             self._show_elements(self.headers)
-
-            # Send the two images off to get merged into one
-            image_data = self._crop_and_stitch_image(header_image, footer_image)
+            return header_frame, footer_frame
         elif self.headers:
             # Scroll to the top so that the headers are not covering content
             self.sh.scroll_window_to_position(0)
-            time.sleep(0.5)
-            image_data = self._get_image_data()
+            self._wait_for_settle(STICKY_SCROLL_DELAY)
         elif self.footers:
             # Scroll to the bottom so that the footer items are not covering content
             self.sh.scroll_window_to_position(40000)
-            time.sleep(0.5)
-            image_data = self._get_image_data()
+            self._wait_for_settle(STICKY_SCROLL_DELAY)
+
+        return self._grab_frame(),
+
+    def _full_page_from_frames(self, frames, sink=None, pixel_match_offset=None):
+        """
+        Turns the frames from _grab_full_page_frames() into the saved full page image
+        :param
+            - pixel_match_offset:   int - The rows _crop_and_stitch_image matches. Defaults to self.pixel_match_offset
+        :return
+            - StringIO: A StingIO object containing the captured image
+        """
+        if len(frames) == 2:
+            # Send the two images off to get merged into one
+            header_frame, footer_frame = frames
+            image_data = self._crop_and_stitch_image(self._frame_to_image(header_frame, True),
+                                                     self._frame_to_image(footer_frame), pixel_match_offset)
         else:
-            image_data = self._get_image_data()
+            image_data = self._frame_to_image(frames[0])
+
+        return self._create_image_file(image_data, sink)
+
+    def _viewport_from_frame(self, frame):
+        """
+        Turns a frame from _grab_frame() into the saved image of the viewport
+        :return
+            - StringIO: A StingIO object containing the captured image
+        """
+        return self._create_image_file(self._frame_to_image(frame, viewport_only=True))
+
+    def _submit_pipeline_job(self, function, *args):
+        """
+        Runs the function in the pipeline's worker pool, starting the pool if needed
+        :return
+            - AsyncResult:  The pending result of the function
+        """
+        if self._pipeline_pool is None:
+            self._pipeline_pool = ThreadPool(self.pipeline_workers)
+        return self._pipeline_pool.apply_async(self._run_pipeline_job, (function,) + args)
 
-        return self._create_image_file(image_data)
+    def _run_pipeline_job(self, function, *args):
+        """
+        Runs a pipeline job on a worker thread, turning any error into a ScreenshotException for the caller of get()
+        """
+        try:
+            return function(*args)
+        except ScreenshotException:
+            raise
+        except Exception as e:
+            message = "Unhandled exception while creating a pipelined screenshot | {0}".format(e)
+            raise ScreenshotException(message, stacktrace=traceback.format_exc())
+
+    def _wait_for_settle(self, fixed_delay):
+        """
+        Waits for the page to stop moving after a scroll or resize. The browser is asked to report back once the scroll
+        position and page size have held still for self.settle_frames animation frames. The fixed delay is slept
+        instead when settling is turned off, or when the page does not settle in time, for instance because the window
+        is in the background and gets no animation frames. If the driver cannot run asynchronous scripts at all, the
+        settle check is not tried again by this instance.
+        :param
+            - fixed_delay:  float - The number of seconds to sleep when the settle check can't be used
+        """
+        if self.settle_frames and self._settle_check_supported:
+            try:
+                if self.sh.wait_for_layout_to_settle(self.settle_frames, self.settle_timeout):
+                    return
+            except DriverExceptions as settle_error:
+                if async_script_unsupported(settle_error):
+                    self._settle_check_supported = False
+
+        if fixed_delay:
+            time.sleep(fixed_delay)
 
     def _hide_elements(self, css_selectors):
         """
@@ -260,91 +714,160 @@ class Screenshot:
             except ElementError:
                 pass
 
-    def _capture_headless_page(self, viewport_only):
+    def _capture_headless_page(self, viewport_only, sink=None):
         if self.paginated and not viewport_only:
             return self._capture_headless_paginated_page()
 
+        if not viewport_only and self.devtools_capture:
+            image_file = self._capture_devtools_page(sink)
+            if image_file is not None:
+                return image_file
+
         # Store the current size and scroll position of the browser
         width, height = self.sh.get_window_size()
         current_scroll_position = self.sh.get_window_current_scroll_position()
 
         if not viewport_only:
             content_height = self.sh.get_content_height(self.content_container_selector)
+            if content_height > self.max_height and not self.encoder.is_png:
+                message = "Headless pages taller than {0} pixels can only be saved as PNGs, not as '{1}' " \
+                          "files".format(int(self.max_height), self.file_extenson)
+                raise ScreenshotException(message, details={"content_height": content_height,
+                                                            "encoder": repr(self.encoder)})
             if content_height > self.max_height:
                 self.sh.resize_browser(width, self.max_height + self.head_padding)
-                time.sleep(self.resize_delay)
+                self._wait_for_settle(self.resize_delay)
             elif height < content_height:
                 self.sh.resize_browser(width, content_height + self.head_padding)
-                time.sleep(self.resize_delay)
+                self._wait_for_settle(self.resize_delay)
             self.sh.scroll_window_to_position(scroll_bottom=True)
-            time.sleep(self.resize_delay)
+            self._wait_for_settle(self.resize_delay)
 
             if content_height > self.max_height:
-                images_list = []
-                number_of_loops = int(math.ceil(content_height / self.max_height))
-
-                # Loop through, starting at one for multiplication purposes
-                for i in range(1, number_of_loops + 1):
-                    image_data = self.sh.get_screenshot_base64()
-                    image = Image.open(StringIO(image_data.decode('base64')))
-                    images_list.append(image)
-                    self.sh.scroll_window_to_position(self.max_height * i)
-
-                # Combine al of the images into one capture
-                image = self._combine_vertical_images(images_list, content_height)
+                # Write each capture straight to the PNG so the whole page is never held in memory at once
+                image_file = self._stream_vertical_images(content_height, sink)
             else:
-                # Gather image byte data
-                image_data = self.sh.get_screenshot_base64()
-                # Create an image canvas and write the byte data to it
-                image = Image.open(StringIO(image_data.decode('base64')))
+                # The capture is the whole page, so the browser's image can be used as it is
+                image_file = self._create_raw_image_file(self.sh.get_screenshot_base64(), sink)
 
         else:
-            # Gather image byte data
-            image_data = self.sh.get_screenshot_base64()
-            # Create an image canvas and write the byte data to it
-            image = Image.open(StringIO(image_data.decode('base64')))
+            # The capture is only the viewport, so the browser's image can be used as it is
+            image_file = self._create_raw_image_file(self.sh.get_screenshot_base64(), sink)
 
         # - Return the browser to its previous size and scroll position
         if not viewport_only:
             self.sh.resize_browser(width, height)
             self.sh.scroll_window_to_position(current_scroll_position)
-            time.sleep(self.resize_delay)
+            self._wait_for_settle(self.resize_delay)
+
+        return image_file
+
+    def _capture_devtools_page(self, sink=None):
+        """
+        Captures the whole page with a DevTools screenshot that renders the content beyond the viewport, so the window
+        is never resized or scrolled. If Chrome does not support the capture, it is not tried again by this instance.
+        :param
+            - sink:     string or file - A file path or file-like object to write to instead of a new StringIO
+        :return
+            - image_file:   StringIO() - The saved image, or None if the page has to be captured by resizing the window
+        """
+        try:
+            metrics = self.sh.execute_cdp_command("Page.getLayoutMetrics")
+            # Newer versions of Chrome report device pixels in the old fields and add CSS pixel versions
+            content_size = metrics.get("cssContentSize", metrics["contentSize"])
+            viewport = metrics.get("cssLayoutViewport", metrics["layoutViewport"])
+
+            if self.content_container_selector == "html":
+                content_height = content_size["height"]
+            else:
+                content_height = self.sh.get_content_height(self.content_container_selector)
+
+            # Pages taller than one image can hold are streamed a window at a time instead
+            if content_height > self.max_height:
+                return None
+
+            clip = {"x": 0, "y": 0, "width": viewport["clientWidth"], "height": content_height, "scale": 1}
+            screenshot = self.sh.execute_cdp_command("Page.captureScreenshot", {"format": "png",
+                                                                                "captureBeyondViewport": True,
+                                                                                "clip": clip})
+        except (DriverExceptions, KeyError):
+            self.devtools_capture = False
+            return None
 
-        return self._create_image_file(image)
+        return self._create_raw_image_file(screenshot["data"], sink)
 
-    def _combine_vertical_images(self, images_list, content_height):
-        height_of_full_images = 0
-        total_height = 0
-        total_width = 0
+    def _stream_vertical_images(self, content_height, sink=None):
+        """
+        Captures the page one window height at a time, starting at the top, and writes each capture to a PNG as soon as
+        it is taken. Only one capture is decoded at a time, so memory use depends on the window size and not the
+        height of the page. Only PNGs can be written a band at a time, so the encoder must be a PNG encoder.
+        :param
+            - content_height:   int - The height of the page content, in CSS pixels
+            - sink:             string or file - A file path or file-like object to write to instead of a new StringIO
+        :return
+            - image_file:   StringIO() - The StringIO object, or the given sink, containing the saved image
+        """
+        png_file = StringIO() if sink is None else sink
+        compress_level = self.encoder.save_options.get("compress_level", DEFAULT_COMPRESS_LEVEL)
+        total_height = int(round(content_height * self.scale_factor))
+        number_of_loops = int(math.ceil(content_height / self.max_height))
+        writer = None
+        rows_captured = 0
 
-        # Make the last image the height of the remaining content
-        for image in images_list[:-1]:
-            height_of_full_images += image.size[1]
-        remaining_height = (content_height * self.scale_factor) - height_of_full_images
+        try:
+            # Loop through, starting at one for multiplication purposes
+            for i in range(1, number_of_loops + 1):
+                image_data = self.sh.get_screenshot_base64()
+                image = Image.open(StringIO(image_data.decode('base64')))
+                image_width, image_height = image.size
 
-        images_list[-1] = images_list[-1].crop((0,
-                                               images_list[-1].size[1] - remaining_height,
-                                               images_list[-1].size[0],
-                                               images_list[-1].size[1]))
+                if writer is None:
+                    output_width, output_height = downscaled_size((image_width, total_height), self.target_width)
+                    writer = PNGStreamWriter(png_file, output_width, output_height, compress_level)
 
-        for image in images_list:
-            total_width = image.size[0] if image.size[0] > total_width else total_width
-            total_height += image.size[1]
+                tile_height = min(total_height - rows_captured, image_height)
+                if i == number_of_loops:
+                    # Make the last image the height of the remaining content
+                    tile_box = (0, image_height - tile_height, image_width, image_height)
+                else:
+                    tile_box = (0, 0, image_width, tile_height)
+                rows_captured += tile_height
 
-        resulting_image = Image.new('RGB', (total_width, total_height))
-        current_height = 0
-        for i, image in enumerate(images_list):
-            resulting_image.paste(im=image, box=(0, current_height))
-            current_height += image.size[1]
+                if writer.width == image_width:
+                    writer.write_image(image, tile_box)
+                else:
+                    # Shrink each window as it is captured. The output rows are rounded from the rows captured so far so
+                    # that the tiles always add up to the height of the downscaled page
+                    output_rows = int(round(rows_captured * writer.height / float(total_height))) - writer.rows_written
+                    if output_rows > 0:
+                        writer.write_image(image.crop(tile_box).resize((writer.width, output_rows), DOWNSCALE_FILTER))
+
+                self.sh.scroll_window_to_position(self.max_height * i)
 
-        return resulting_image
+            writer.close()
+        finally:
+            # Closes a file the writer opened if a capture fails part way through the page
+            if writer is not None:
+                writer.abort()
+
+        if sink is None:
+            png_file.seek(0)
+        return png_file
 
     def _capture_paginated_page(self, padding=None):
         """
         Captures the page viewport by viewport, leaving an overlap of pixels the height of the self.padding variable
         between each image
         """
-        image_list = []
+        return list(self._iter_paginated_page(padding))
+
+    def _iter_paginated_page(self, padding=None, capture=None):
+        """
+        Generator version of _capture_paginated_page. Each image is yielded as soon as it is captured, before the page
+        is scrolled for the next one. The capture function, _capture_single_viewport by default, is what is yielded
+        for each viewport.
+        """
+        capture = capture or self._capture_single_viewport
         scroll_padding = padding if padding else self.scroll_padding
 
         # Scroll page to the top
@@ -355,11 +878,11 @@ class Screenshot:
 
         while True:
             # Capture the image
-            image_list.append(self._capture_single_viewport())
+            yield capture()
 
             # Scroll for the next one!
             self.sh.scroll_window_to_position(current_scroll_position + viewport_height - scroll_padding)
-            time.sleep(0.25)
+            self._wait_for_settle(PAGINATED_SCROLL_DELAY)
             new_scroll_position = self.sh.get_window_current_scroll_position()
 
             # Break if the scroll position did not change (because it was at the bottom)
@@ -368,14 +891,20 @@ class Screenshot:
             else:
                 current_scroll_position = new_scroll_position
 
-        return image_list
-
     def _capture_headless_paginated_page(self, padding=None):
         """
         Captures the page viewport by viewport, leaving an overlap of pixels the height of the self.padding variable
         between each image
         """
-        image_list = []
+        return list(self._iter_headless_paginated_page(padding))
+
+    def _iter_headless_paginated_page(self, padding=None, capture=None):
+        """
+        Generator version of _capture_headless_paginated_page. Each image is yielded as soon as it is captured, before
+        the page is scrolled for the next one. The capture function, which saves the browser's screenshot by default,
+        is what is yielded for each viewport.
+        """
+        capture = capture or (lambda: self._create_raw_image_file(self.sh.get_screenshot_base64()))
         scroll_padding = padding if padding else self.scroll_padding
 
         # Scroll page to the top
@@ -386,13 +915,11 @@ class Screenshot:
 
         while True:
             # Capture the image
-            image_data = self.sh.get_screenshot_base64()
-            image_file = self._create_image_file(Image.open(StringIO(image_data.decode('base64'))))
-            image_list.append(image_file)
+            yield capture()
 
             # Scroll for the next one!
             self.sh.scroll_window_to_position(current_scroll_position + viewport_height - scroll_padding)
-            time.sleep(0.25)
+            self._wait_for_settle(PAGINATED_SCROLL_DELAY)
             new_scroll_position = self.sh.get_window_current_scroll_position()
 
             # Break if the scroll position did not change (because it was at the bottom)
@@ -401,8 +928,6 @@ class Screenshot:
             else:
                 current_scroll_position = new_scroll_position
 
-        return image_list
-
     def _get_image_data(self, viewport_only=False):
         """
         Creates an Image() canvas of the page. The image is cropped to be only the viewport area if specified.
@@ -412,18 +937,40 @@ class Screenshot:
         :return
             - image:    Image() - The image canvas of the captured data
         """
-        # - Capture the image
+        return self._frame_to_image(self._grab_frame(), viewport_only)
+
+    def _grab_frame(self):
+        """
+        Grabs the screenshot bytes and the viewport geometry, the only part of a capture that needs the browser
+        :return
+            - frame:    tuple - The base64 screenshot data and the get_viewport_geometry() dictionary
+        """
         # Gather image byte data
         image_data = self.sh.get_screenshot_base64()
+        # The scroll position, viewport size and pixel ratio all come from one script
+        geometry = self.sh.get_viewport_geometry()
+        return image_data, geometry
+
+    def _frame_to_image(self, frame, viewport_only=False):
+        """
+        Decodes a frame from _grab_frame() and crops it the same way _get_image_data() does
+        :param
+            - frame:            tuple - The base64 screenshot data and viewport geometry
+            - viewport_only:    bool - Crops to only the visible /viewport area if true
+        :return
+            - image:    Image() - The image canvas of the captured data
+        """
+        image_data, geometry = frame
         # Create an image canvas and write the byte data to it
         image = Image.open(StringIO(image_data.decode('base64')))
 
         # - Crop the image to just the visible area
-        # Top of the viewport
-        current_scroll_position = self.sh.get_window_current_scroll_position()
+        pixel_ratio = geometry["device_pixel_ratio"]
 
-        # Viewport Dimensions
-        viewport_width, viewport_height = self.sh.get_viewport_size()
+        # Top of the viewport, and the viewport dimensions, in image pixels
+        current_scroll_position = int(round(geometry["scroll_y"] * pixel_ratio))
+        viewport_width = int(round(geometry["viewport_width"] * pixel_ratio))
+        viewport_height = int(round(geometry["viewport_height"] * pixel_ratio))
 
         # Image size of data returned by Selenium
         image_height, image_width = image.size
@@ -443,7 +990,35 @@ class Screenshot:
             cropped_image = image.crop(crop_box)
             return cropped_image
 
-    def _crop_and_stitch_image(self, header_image, footer_image):
+    def _element_crop_box(self, geometry, image_size):
+        """
+        Works out the box, in image pixels, of the part of an element that is inside the viewport
+        :param
+            - geometry:     dict - The element geometry from SeleniumHelpers.get_element_geometry()
+            - image_size:   tuple - The (width, height) of the browser's screenshot
+        :return
+            - crop_box:     tuple - The (left, top, right, bottom) box to crop the screenshot to
+        """
+        pixel_ratio = geometry["device_pixel_ratio"]
+
+        # Keep only the part of the element inside the viewport
+        left = max(geometry["left"], 0)
+        top = max(geometry["top"], 0)
+        right = min(geometry["left"] + geometry["width"], geometry["viewport_width"])
+        bottom = min(geometry["top"] + geometry["height"], geometry["viewport_height"])
+        if right <= left or bottom <= top:
+            message = "The element has no visible area to capture"
+            raise ScreenshotException(message, details={"element_geometry": geometry})
+
+        # Some browsers screenshot the whole page rather than the viewport, the viewport is offset by the scroll there
+        offset_x = offset_y = 0
+        if image_size[1] > int(round(geometry["viewport_height"] * pixel_ratio)):
+            offset_x, offset_y = geometry["scroll_x"], geometry["scroll_y"]
+
+        return tuple(int(round((value + offset) * pixel_ratio)) for value, offset in
+                     ((left, offset_x), (top, offset_y), (right, offset_x), (bottom, offset_y)))
+
+    def _crop_and_stitch_image(self, header_image, footer_image, pixel_match_offset=None):
         """
         This object takes in a header and footer image. It then searched for a block of 100 mixles that matches between
         the two images. Once it finds this point the footer image is cropped above the "match" point. A new canvas is
@@ -452,6 +1027,7 @@ class Screenshot:
         :param
             - header_image:     Image() - The top of the page, usually displays all of the headers elements
             - footer_image:     Image() - The bottom of the page, usually displays all of the footer elements
+            - pixel_match_offset:   int - The number of rows to match. Defaults to self.pixel_match_offset
         :return
             - stitched_image:   Image() - The resulting image of the crop and stitching of the header and footer images
         """
@@ -461,34 +1037,14 @@ class Screenshot:
             footer_array = numpy.asarray(footer_image)
 
             # - Find a place in both images that match then crop and stitch them at that location
-            crop_row = 0
             header_image_height = header_image.height
-            # Set the offset to the height of the image if the height is less than the offset
-            if self.pixel_match_offset > header_image_height:
-                self.pixel_match_offset = header_image_height
-
-            # - Find the pixel row in the footer image that matches the bottom row in the header image
-            # Grab the last 100 rows of header_image
-            header_last_hundred_rows = header_array[header_image_height - self.pixel_match_offset: header_image_height]
-
-            # Iterates throughout the check, will match the height of the row being checked in the image.
-            for i, footer_row in enumerate(footer_array):
-                # Jump out if the crop row has been set
-                if crop_row != 0:
-                    break
+            # Limit the offset to the height of the image if the height is less than the offset
+            if pixel_match_offset is None:
+                pixel_match_offset = self.pixel_match_offset
+            pixel_match_offset = min(pixel_match_offset, header_image_height)
 
-                # Check if the current row being inspected matches the header row 100 pixels above the bottom
-                if numpy.array_equal(footer_row, header_last_hundred_rows[0]):
-                    # It is a match!
-                    for y, row in enumerate(header_last_hundred_rows):
-                        # Check that the 100 footer rows above the matching row also match the bottom 100 of
-                        # the header image we grabbed at the start of this check
-                        if numpy.array_equal(footer_array[i + y], header_last_hundred_rows[y]):
-                            # Check whether we've found 100 matching rows or not
-                            if y == self.pixel_match_offset - 1:
-                                # Yes! All 100 matched. Set the crop row to this row
-                                crop_row = i + self.pixel_match_offset
-                                break
+            # - Find the pixel row in the footer image that matches the bottom rows in the header image
+            crop_row = find_overlap_row(header_array, footer_array, pixel_match_offset)
 
             # If no rows matched, crop at height of header image
             if crop_row == 0:
@@ -521,24 +1077,62 @@ class Screenshot:
             message = "Error while cropping and stitching a full page screenshot | {0}".format(e)
             raise ScreenshotException(message, stacktrace=traceback.format_exc())
 
-    def _create_image_file(self, image):
+    def _create_image_file(self, image, sink=None):
         """
         This method takes an Image() variable and saves it into a StringIO "file".
         :param
             - image_data:   Image() - The image to be saved into the StringIO object
+            - sink:         string or file - A file path or file-like object to save to instead of a new StringIO
 
         :return
-            - image_file:   StingIO() - The stringIO object containing the saved image
+            - image_file:   StingIO() - The stringIO object, or the given sink, containing the saved image
         """
+        image = downscale_image(image, self.target_width)
+
+        if sink is not None:
+            self.encoder.encode(image, sink)
+            return sink
+
         # Instantiate the file object
         image_file = StringIO()
-        # Save the image canvas to the file as the given file type
-        image.save(image_file, self.file_extenson.upper())
+        # Save the image canvas to the file with the class's encoder
+        self.encoder.encode(image, image_file)
         # Set the file marker back to the beginning
         image_file.seek(0)
 
         return image_file
 
+    def _create_raw_image_file(self, image_data, sink=None):
+        """
+        This method takes the base64 image data returned by the browser and puts it into a StringIO "file". When the
+        data is already a PNG and the encoder allows it, its bytes are used as they are instead of being decoded into an
+        Image() and encoded again.
+        :param
+            - image_data:   string - The base64 image data returned by the browser
+            - sink:         string or file - A file path or file-like object to save to instead of a new StringIO
+
+        :return
+            - image_file:   StingIO() - The stringIO object, or the given sink, containing the saved image
+        """
+        image_bytes = image_data.decode('base64')
+        if not self.encoder.keep_browser_png or not image_bytes.startswith(PNG_SIGNATURE):
+            return self._create_image_file(Image.open(StringIO(image_bytes)), sink)
+
+        # Opening the image only reads its header, the pixels are only decoded if it has to be downscaled
+        image = Image.open(StringIO(image_bytes))
+        if downscaled_size(image.size, self.target_width) != image.size:
+            return self._create_image_file(image, sink)
+
+        if sink is None:
+            return StringIO(image_bytes)
+        elif isinstance(sink, basestring):
+            with open(sink, "wb") as image_file:
+                image_file.write(image_bytes)
+        else:
+            sink.write(image_bytes)
+
+        return sink
+
 
 class ScreenshotException(Exception):
     def __init__(self, msg, stacktrace=None, details=None):